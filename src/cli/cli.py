@@ -1,7 +1,9 @@
 import re
 import time
 
+from cli.formatters import FORMATS, format_description, write_cells, write_results
 from cli.help_dict import COMMANDS
+from cli.profiler import CommandProfiler
 from cli.regex_patterns import *
 from hbase.hbase import Hbase
 
@@ -10,6 +12,8 @@ class CommandLineInterface:
     def run(self):
         try:
             hbase = Hbase(data_dir="hbase/data")
+            profiler = CommandProfiler()
+            output_format = "table"
 
             while True:
                 temp_input = input("$ ")
@@ -28,7 +32,11 @@ class CommandLineInterface:
                 while True:
                     try:
                         user_input = input(f"hbase(main):{n_line:03d}:0> ")
+                        if not user_input.startswith("profile"):
+                            profiler.start(user_input)
+
                         if user_input == "exit":
+                            hbase.flush_all()
                             break
                         elif user_input == "help":
                             for command, (usage, description) in COMMANDS.items():
@@ -139,9 +147,9 @@ class CommandLineInterface:
                             start = time.time()
                             table_name = re.match(DESCRIBE_PATTERN, user_input).group(1)
 
-                            table_description, n_rows = hbase.describe_table(table_name)
+                            metadata = hbase.describe_table(table_name)
 
-                            print(table_description)
+                            print(format_description(metadata))
                             end = time.time()
                             print(f"0 row(s) in {end - start:.4f} seconds")
                         elif re.match(PUT_PATTERN, user_input):  # Put
@@ -165,8 +173,19 @@ class CommandLineInterface:
                             row_key = match.group(2)
                             cf, cq = match.group(3).split(':') if match.group(3) else (None, None)
 
-                            result, n_rows = hbase.get_row(table_name, row_key, cf, cq)
-                            print(result)
+                            result = hbase.get_row(table_name, row_key, cf, cq)
+                            n_rows = write_cells(result, output_format)
+
+                            end = time.time()
+                            print(f"{n_rows} row(s) in {end - start:.4f} seconds")
+                        elif re.match(GET_ROWS_PATTERN, user_input):  # Get Rows
+                            start = time.time()
+                            table_name, row_keys = re.match(GET_ROWS_PATTERN, user_input).groups()
+
+                            row_keys = re.findall(r"'(\w+)'", row_keys)
+
+                            results = hbase.get_rows(table_name, row_keys)
+                            n_rows = write_results(results, output_format)
 
                             end = time.time()
                             print(f"{n_rows} row(s) in {end - start:.4f} seconds")
@@ -175,11 +194,13 @@ class CommandLineInterface:
                             match = re.match(SCAN_PATTERN, user_input)
 
                             table_name = match.group(1)
+                            options = dict(re.findall(r"(\w+)\s*=>\s*'([^']*)'", match.group(2) or ""))
 
-                            print(hbase.scan(table_name))
+                            results = hbase.scan(table_name, options.get("STARTROW"), options.get("STOPROW"))
+                            n_rows = write_results(results, output_format)
 
                             end = time.time()
-                            print(f"0 row(s) in {end - start:.4f} seconds")
+                            print(f"{n_rows} row(s) in {end - start:.4f} seconds")
                         elif re.match(DELETE_PATTERN, user_input):  # Delete
                             start = time.time()
                             match = re.match(DELETE_PATTERN, user_input)
@@ -224,13 +245,207 @@ class CommandLineInterface:
 
                             end = time.time()
                             print(f"0 row(s) in {end - start:.4f} seconds")
+                        elif re.match(TRUNCATE_PRESERVE_PATTERN, user_input):  # Truncate Preserve
+                            start = time.time()
+                            table_name = re.match(TRUNCATE_PRESERVE_PATTERN, user_input).group(1)
+
+                            hbase.truncate_preserve(table_name)
+
+                            end = time.time()
+                            print(f"0 row(s) in {end - start:.4f} seconds")
+                        elif re.match(AGGREGATE_PATTERN, user_input):  # Aggregate
+                            start = time.time()
+                            match = re.match(AGGREGATE_PATTERN, user_input)
+
+                            table_name, function, cell = match.group(1), match.group(2), match.group(3)
+                            cf, cq = cell.split(':')
+                            options = dict(re.findall(r"(\w+)\s*=>\s*'([^']*)'", match.group(4) or ""))
+
+                            value = hbase.aggregate(table_name, function, cf, cq,
+                                                    options.get("STARTROW"), options.get("STOPROW"))
+
+                            end = time.time()
+                            print(f"{function.upper()} = {value}")
+                            print(f"0 row(s) in {end - start:.4f} seconds")
+                        elif re.match(INCR_PATTERN, user_input):  # Increment
+                            start = time.time()
+                            match = re.match(INCR_PATTERN, user_input)
+
+                            table_name = match.group(1)
+                            row_key = match.group(2)
+                            cf, cq = match.group(3).split(':')
+                            delta = int(match.group(4)) if match.group(4) else 1
+
+                            value = hbase.increment(table_name, row_key, cf, cq, delta)
+
+                            end = time.time()
+                            print(f"COUNTER VALUE = {value}")
+                            print(f"0 row(s) in {end - start:.4f} seconds")
+                        elif re.match(GET_COUNTER_PATTERN, user_input):  # Get Counter
+                            start = time.time()
+                            match = re.match(GET_COUNTER_PATTERN, user_input)
+
+                            table_name = match.group(1)
+                            row_key = match.group(2)
+                            cf, cq = match.group(3).split(':')
+
+                            value = hbase.get_counter(table_name, row_key, cf, cq)
+
+                            end = time.time()
+                            print(f"COUNTER VALUE = {value}" if value is not None else "No counter found at specified coordinates")
+                            print(f"0 row(s) in {end - start:.4f} seconds")
+                        elif re.match(CHECK_AND_PUT_PATTERN, user_input):  # Check and Put
+                            start = time.time()
+                            match = re.match(CHECK_AND_PUT_PATTERN, user_input)
+
+                            table_name, row_key, cell, op, expected, nil, put_cell, value = match.groups()
+                            cf, cq = cell.split(':')
+                            put_cf, put_cq = put_cell.split(':')
+
+                            applied = hbase.check_and_put(table_name, row_key, cf, cq, op, None if nil else expected,
+                                                          put_cf, put_cq, value)
+
+                            end = time.time()
+                            print(applied)
+                            print(f"0 row(s) in {end - start:.4f} seconds")
+                        elif re.match(CHECK_AND_DELETE_PATTERN, user_input):  # Check and Delete
+                            start = time.time()
+                            match = re.match(CHECK_AND_DELETE_PATTERN, user_input)
+
+                            table_name, row_key, cell, op, expected, nil, delete_cell = match.groups()
+                            cf, cq = cell.split(':')
+                            delete_cf, delete_cq = delete_cell.split(':') if delete_cell else (None, None)
+
+                            applied = hbase.check_and_delete(table_name, row_key, cf, cq, op, None if nil else expected,
+                                                             delete_cf, delete_cq)
+
+                            end = time.time()
+                            print(applied)
+                            print(f"0 row(s) in {end - start:.4f} seconds")
+                        elif re.match(FLUSH_PATTERN, user_input):  # Flush
+                            start = time.time()
+                            table_name = re.match(FLUSH_PATTERN, user_input).group(1)
+
+                            hbase.flush(table_name)
+
+                            end = time.time()
+                            print(f"0 row(s) in {end - start:.4f} seconds")
+                        elif re.match(COMPACT_PATTERN, user_input):  # Compact
+                            start = time.time()
+                            table_name = re.match(COMPACT_PATTERN, user_input).group(1)
+
+                            hbase.compact(table_name)
+
+                            end = time.time()
+                            print(f"0 row(s) in {end - start:.4f} seconds")
+                        elif re.match(MAJOR_COMPACT_PATTERN, user_input):  # Major Compact
+                            start = time.time()
+                            table_name = re.match(MAJOR_COMPACT_PATTERN, user_input).group(1)
+
+                            hbase.major_compact(table_name)
+
+                            end = time.time()
+                            print(f"0 row(s) in {end - start:.4f} seconds")
+                        elif re.match(STATUS_PATTERN, user_input):  # Status
+                            status_type = re.match(STATUS_PATTERN, user_input).group(1)
+
+                            if not status_type:
+                                print(f"{len(hbase.list_tables())} tables")
+                            elif status_type == "maintenance":
+                                status = hbase.maintenance.status()
+                                print(f"{len(status['queued'])} queued, {len(status['running'])} running, "
+                                      f"{status['completed']} completed, {status['failed']} failed, "
+                                      f"{status['throttled']} throttled writes")
+                                for kind, table_name in status['running']:
+                                    print(f" RUNNING {kind} '{table_name}'")
+                                for kind, table_name, due_in in status['queued']:
+                                    print(f" QUEUED  {kind} '{table_name}' in {due_in:.2f} seconds")
+                                for table_name, n_edits in status['unflushed_edits'].items():
+                                    print(f" DIRTY   '{table_name}' {n_edits} unflushed edit(s)")
+                                if status['last_error']:
+                                    print(f" LAST ERROR {status['last_error']}")
+                            elif status_type == "replication":
+                                for peer in hbase.list_peers():
+                                    age = f"{peer['age_of_last_shipped']:.2f}s" if peer['age_of_last_shipped'] is not None else "-"
+                                    print(f" PEER {peer['id']} ({'ENABLED' if peer['enabled'] else 'DISABLED'}): "
+                                          f"lag={peer['lag_edits']} edit(s), {peer['lag_bytes']} byte(s), "
+                                          f"ageOfLastShippedOp={age}")
+                                    if peer['last_error']:
+                                        print(f"  LAST ERROR {peer['last_error']}")
+                            else:
+                                print(f"Unknown status type '{status_type}'")
+                        elif re.match(ADD_PEER_PATTERN, user_input):  # Add Peer
+                            start = time.time()
+                            peer_id, path = re.match(ADD_PEER_PATTERN, user_input).groups()
+
+                            hbase.add_peer(peer_id, path)
+
+                            end = time.time()
+                            print(f"0 row(s) in {end - start:.4f} seconds")
+                        elif re.match(REMOVE_PEER_PATTERN, user_input):  # Remove Peer
+                            start = time.time()
+                            peer_id = re.match(REMOVE_PEER_PATTERN, user_input).group(1)
+
+                            hbase.remove_peer(peer_id)
+
+                            end = time.time()
+                            print(f"0 row(s) in {end - start:.4f} seconds")
+                        elif re.match(ENABLE_PEER_PATTERN, user_input):  # Enable Peer
+                            start = time.time()
+                            peer_id = re.match(ENABLE_PEER_PATTERN, user_input).group(1)
+
+                            hbase.enable_peer(peer_id)
+
+                            end = time.time()
+                            print(f"0 row(s) in {end - start:.4f} seconds")
+                        elif re.match(DISABLE_PEER_PATTERN, user_input):  # Disable Peer
+                            start = time.time()
+                            peer_id = re.match(DISABLE_PEER_PATTERN, user_input).group(1)
+
+                            hbase.disable_peer(peer_id)
+
+                            end = time.time()
+                            print(f"0 row(s) in {end - start:.4f} seconds")
+                        elif re.match(LIST_PEERS_PATTERN, user_input):  # List Peers
+                            start = time.time()
+                            peers = hbase.list_peers()
+
+                            print("PEER_ID\t\tDATA_DIR\t\tSTATE")
+                            for peer in peers:
+                                print(f"{peer['id']}\t\t{peer['path']}\t\t{'ENABLED' if peer['enabled'] else 'DISABLED'}")
+
+                            end = time.time()
+                            print(f"{len(peers)} row(s) in {end - start:.4f} seconds")
+                        elif re.match(FORMAT_PATTERN, user_input):  # Output Format
+                            new_format = re.match(FORMAT_PATTERN, user_input).group(1)
+                            if new_format not in FORMATS:
+                                raise Exception(f"Unknown output format '{new_format}'. Use one of: {', '.join(FORMATS)}")
+
+                            output_format = new_format
+                            print(f"Output format set to '{output_format}'")
+                        elif re.match(PROFILE_PATTERN, user_input):  # Profile
+                            mode = re.match(PROFILE_PATTERN, user_input).group(1)
+
+                            if mode == "off":
+                                profiler.disable()
+                                print("Profiling disabled")
+                            else:
+                                profiler.enable(mode)
+                                print(f"Profiling enabled, writing to {profiler.session_dir}")
+                        elif re.match(PROFILE_REPORT_PATTERN, user_input):  # Profile Report
+                            limit = re.match(PROFILE_REPORT_PATTERN, user_input).group(1)
+
+                            print(profiler.report(int(limit) if limit else 15))
                         else:
                             print(f"Unknown command: '{user_input}'. Try 'help'.")
 
                         n_line += 1
                     except KeyboardInterrupt:
+                        hbase.flush_all()
                         break
                     except Exception as e:
                         print(f"Error: {e}")
+                    finally:
+                        profiler.stop()
         except KeyboardInterrupt:  # Catch Ctrl+C by exiting the program
             print("Bye!")
@@ -0,0 +1,107 @@
+import csv
+import json
+import sys
+from typing import Iterable, List
+
+from hbase.table_dataclasses import MetaData, Result
+
+CHUNK_SIZE = 64 * 1024
+FORMATS = ("table", "json", "csv")
+
+
+class ChunkedWriter:
+    # Collects the output lines and hands them to sys.stdout in ~64 KiB chunks, instead of
+    # building one string for the whole result or writing line by line
+    def __init__(self, out=None):
+        self.out = out or sys.stdout
+        self._buffer: List[str] = []
+        self._buffered = 0
+
+    def write(self, text: str) -> None:
+        self._buffer.append(text)
+        self._buffered += len(text)
+        if self._buffered >= CHUNK_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._buffer:
+            self.out.write("".join(self._buffer))
+            self._buffer = []
+            self._buffered = 0
+        self.out.flush()
+
+
+def write_results(results: Iterable[Result], output_format: str = "table", out=None) -> int:
+    # Returns the number of rows written
+    writer = ChunkedWriter(out)
+    n_rows = 0
+
+    if output_format == "table":
+        writer.write("ROW\t\t\t COLUMN+CELL\n")
+        for result in results:
+            n_rows += 1
+            for cell in result.cells:
+                writer.write(f"{result.row_key}\t\t\t column={cell.column_family}:{cell.column_qualifier}, "
+                             f"timestamp={cell.timestamp}, value={cell.value}\n")
+    elif output_format == "json":
+        writer.write("[")
+        for result in results:
+            writer.write(",\n " if n_rows else "\n ")
+            writer.write(json.dumps({"row": result.row_key, "families": result.to_dict()}, ensure_ascii=False))
+            n_rows += 1
+        writer.write("\n]\n")
+    elif output_format == "csv":
+        rows = csv.writer(writer, lineterminator="\n")
+        rows.writerow(["row", "column_family", "column_qualifier", "timestamp", "value"])
+        for result in results:
+            n_rows += 1
+            for cell in result.cells:
+                rows.writerow([result.row_key, cell.column_family, cell.column_qualifier, cell.timestamp, cell.value])
+    else:
+        raise Exception(f"Unknown output format '{output_format}'. Use one of: {', '.join(FORMATS)}")
+
+    writer.flush()
+    return n_rows
+
+
+def write_cells(result: Result, output_format: str = "table", out=None) -> int:
+    # Output of get, one line per cell. Returns the number of cells written.
+    if output_format != "table":
+        write_results([result] if result.cells else [], output_format, out)
+        return len(result.cells)
+
+    writer = ChunkedWriter(out)
+    writer.write("COLUMN\t\t\t\t\t\tCELL\n")
+    for cell in result.cells:
+        writer.write(f"{cell.column_family}:{cell.column_qualifier}\t\t\t\t"
+                     f"timestamp={cell.timestamp}, value={cell.value}\n")
+    writer.flush()
+    return len(result.cells)
+
+
+def format_description(metadata: MetaData) -> str:
+    lines = [
+        f"Table {metadata.name} is {'DISABLED' if metadata.is_disabled else 'ENABLED'}",
+        metadata.name,
+        "COLUMN FAMILIES DESCRIPTION",
+    ]
+    for cf in metadata.column_families:
+        # Shown in the HBase string form, e.g. TTL => 'FOREVER'
+        properties = cf.to_dict()
+        lines.append(
+            "{"
+            f"NAME => '{cf.name}', "
+            f"DATA_BLOCK_ENCODING => '{properties['data_block_encoding']}', "
+            f"BLOOMFILTER => '{properties['bloomfilter']}', "
+            f"REPLICATION_SCOPE => '{properties['replication_scope']}', "
+            f"VERSIONS => '{properties['versions']}', "
+            f"COMPRESSION => '{properties['compression']}', "
+            f"MIN_VERSIONS => '{properties['min_versions']}', "
+            f"TTL => '{properties['ttl']}', "
+            f"KEEP_DELETED_CELLS => '{properties['keep_deleted_cells']}', "
+            f"BLOCK_SIZE => '{properties['block_size']}', "
+            f"IN_MEMORY => '{properties['in_memory']}', "
+            f"BLOCK_CACHE => '{properties['block_cache']}'"
+            "}"
+        )
+    return "\n".join(lines)
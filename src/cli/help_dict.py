@@ -47,8 +47,12 @@ COMMANDS = {
             "get '<table_name>', '<row_id>'",
             "Gets the contents of a row or cell."
         ),
+        "get_rows": (
+            "get_rows '<table_name>', '<row_id_1>', '<row_id_2>', ...",
+            "Gets the contents of many rows in a single pass."
+        ),
         "scan": (
-            "scan '<table_name>'",
+            "scan '<table_name>', {STARTROW => '<row_id>', STOPROW => '<row_id>'}",
             "Scans and returns the table's data."
         ),
         "delete": (
@@ -65,6 +69,78 @@ COMMANDS = {
         ),
         "truncate": (
             "truncate '<table_name>'",
-            "Disables, drops and recreates the specified table.",
+            "Removes all the data of the specified table, keeping its column families and their settings.",
+        ),
+        "truncate_preserve": (
+            "truncate_preserve '<table_name>'",
+            "Like truncate, but the table also keeps its id and creation time.",
+        ),
+        "aggregate": (
+            "aggregate '<table_name>', 'rowcount'|'sum'|'min'|'max'|'avg'|'std', '<cf>:<cq>', {STARTROW => '<row_id>', STOPROW => '<row_id>'}",
+            "Computes an aggregation of a numeric column inside the engine, optionally over a row range.",
+        ),
+        "incr": (
+            "incr '<table_name>', '<row_id>', '<column_family>:<column_qualifier>', <delta>",
+            "Increments a counter cell by delta (1 by default) and returns the new value.",
+        ),
+        "get_counter": (
+            "get_counter '<table_name>', '<row_id>', '<column_family>:<column_qualifier>'",
+            "Returns the value of a counter cell.",
+        ),
+        "check_and_put": (
+            "check_and_put '<table_name>', '<row_id>', '<cf>:<cq>', '<operator>', '<value>'|nil, '<cf>:<cq>', '<new_value>'",
+            "Puts the new value only if the checked cell compares true against the value (nil: cell does not exist).",
+        ),
+        "check_and_delete": (
+            "check_and_delete '<table_name>', '<row_id>', '<cf>:<cq>', '<operator>', '<value>'|nil, ['<cf>:<cq>']",
+            "Deletes the checked cell (or the given one) only if the checked cell compares true against the value.",
+        ),
+        "flush": (
+            "flush '<table_name>'",
+            "Queues the table to be persisted to disk now instead of after the flush delay.",
+        ),
+        "compact": (
+            "compact '<table_name>'",
+            "Queues a compaction that drops the cell versions over the VERSIONS limit of each family.",
+        ),
+        "major_compact": (
+            "major_compact '<table_name>'",
+            "Queues a compaction that also drops the data of deleted families and rewrites the table file.",
+        ),
+        "status": (
+            "status ['maintenance'|'replication']",
+            "Shows the number of tables, the background maintenance queue or the replication lag of every peer.",
+        ),
+        "add_peer": (
+            "add_peer '<peer_id>', '<data_dir>'",
+            "Replicates the families with REPLICATION_SCOPE => '1' to the database in data_dir.",
+        ),
+        "remove_peer": (
+            "remove_peer '<peer_id>'",
+            "Stops replicating to the peer and forgets it.",
+        ),
+        "enable_peer": (
+            "enable_peer '<peer_id>'",
+            "Resumes shipping edits to the peer from where it stopped.",
+        ),
+        "disable_peer": (
+            "disable_peer '<peer_id>'",
+            "Pauses shipping edits to the peer, they are kept until it is enabled again.",
+        ),
+        "list_peers": (
+            "list_peers",
+            "Lists the replication peers.",
+        ),
+        "format": (
+            "format 'table'|'json'|'csv'",
+            "Sets the output format of get, get_rows and scan.",
+        ),
+        "profile": (
+            "profile on|off|cpu|memory",
+            "Captures cProfile and/or tracemalloc stats for every following command (also enabled with HBASE_PROFILE).",
+        ),
+        "profile_report": (
+            "profile_report [<limit>]",
+            "Shows the top functions by cumulative time and the top allocation sites of the session.",
         ),
     }
\ No newline at end of file
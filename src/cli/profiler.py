@@ -0,0 +1,154 @@
+import cProfile
+import os
+import pstats
+import re
+import tracemalloc
+from datetime import datetime
+from typing import Optional
+
+PROFILE_ENV_VAR = "HBASE_PROFILE"  # on, cpu, memory or all
+PROFILE_DIR_ENV_VAR = "HBASE_PROFILE_DIR"
+DEFAULT_PROFILE_DIR = "hbase/profiles"
+
+MODES = {
+    "on": (True, True),
+    "all": (True, True),
+    "cpu": (True, False),
+    "memory": (False, True),
+}
+ON_VALUES = ("1", "true")
+OFF_VALUES = ("0", "off", "false")
+
+
+def command_slug(command: str) -> str:
+    # First word of the command, safe to use as part of a file name
+    name = command.split(maxsplit=1)[0] if command.strip() else "empty"
+    return re.sub(r"\W", "_", name)
+
+
+class CommandProfiler:
+    def __init__(self, profile_dir: Optional[str] = None, mode: Optional[str] = None):
+        self.profile_dir = profile_dir or os.environ.get(PROFILE_DIR_ENV_VAR, DEFAULT_PROFILE_DIR)
+        self.session = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.cpu = False
+        self.memory = False
+        self.n_commands = 0
+
+        self._profile: Optional[cProfile.Profile] = None
+        self._command: Optional[str] = None
+
+        mode = (mode or os.environ.get(PROFILE_ENV_VAR) or "").lower()
+        if mode in ON_VALUES:
+            mode = "on"
+        if mode in MODES:
+            self.enable(mode)
+        elif mode and mode not in OFF_VALUES:
+            # A typo in the environment must not keep the shell from starting
+            print(f"Warning: invalid {PROFILE_ENV_VAR} '{mode}', profiling is off. Use one of: {', '.join(MODES)}")
+
+    @property
+    def enabled(self) -> bool:
+        return self.cpu or self.memory
+
+    @property
+    def session_dir(self) -> str:
+        return os.path.join(self.profile_dir, self.session)
+
+    def enable(self, mode: str = "on") -> None:
+        if mode not in MODES:
+            raise Exception(f"Invalid profile mode '{mode}'. Use one of: {', '.join(MODES)}")
+        self.cpu, self.memory = MODES[mode]
+
+    def disable(self) -> None:
+        # Drop any capture in progress instead of saving it
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._command = None
+        self.cpu = self.memory = False
+
+    def start(self, command: str) -> None:
+        if not self.enabled or self._command is not None:
+            return
+
+        self._command = command
+        if self.memory:
+            tracemalloc.start()
+        if self.cpu:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def stop(self) -> None:
+        if self._command is None:
+            return
+
+        # Capture first, so the file system work below is not part of the profile
+        profile = self._profile
+        if profile is not None:
+            profile.disable()
+            self._profile = None
+
+        snapshot = None
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            snapshot = snapshot.filter_traces([
+                tracemalloc.Filter(False, cProfile.__file__),
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            ])
+
+        os.makedirs(self.session_dir, exist_ok=True)
+        self.n_commands += 1
+        base = os.path.join(self.session_dir, f"{self.n_commands:04d}_{command_slug(self._command)}")
+
+        if profile is not None:
+            profile.dump_stats(f"{base}.prof")
+
+        if snapshot is not None:
+            snapshot.dump(f"{base}.mem")
+            with open(f"{base}.txt", "w") as f:
+                f.write(f"command: {self._command}\ncurrent: {current}\npeak: {peak}\n")
+
+        self._command = None
+
+    def report(self, limit: int = 15) -> str:
+        if not os.path.isdir(self.session_dir):
+            return "No profiles captured in this session"
+
+        files = sorted(os.listdir(self.session_dir))
+        prof_files = [os.path.join(self.session_dir, f) for f in files if f.endswith(".prof")]
+        mem_files = [os.path.join(self.session_dir, f) for f in files if f.endswith(".mem")]
+
+        lines = [f"Profile report for session {self.session} ({self.session_dir})"]
+
+        if prof_files:
+            stats = pstats.Stats(*prof_files)
+            lines.append(f"\nTOP {limit} FUNCTIONS BY CUMULATIVE TIME ({len(prof_files)} command(s))")
+            lines.append(f"{'CUMTIME':>10} {'TOTTIME':>10} {'CALLS':>8}  FUNCTION")
+            entries = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+            for (file, line, func), (_, n_calls, tottime, cumtime, _) in entries[:limit]:
+                lines.append(f"{cumtime:>10.4f} {tottime:>10.4f} {n_calls:>8}  {func} ({file}:{line})")
+
+        if mem_files:
+            # Merge the allocation statistics of every command by source line
+            totals = {}
+            for mem_file in mem_files:
+                snapshot = tracemalloc.Snapshot.load(mem_file)
+                for stat in snapshot.statistics("lineno"):
+                    key = str(stat.traceback[0])
+                    size, count = totals.get(key, (0, 0))
+                    totals[key] = (size + stat.size, count + stat.count)
+
+            lines.append(f"\nTOP {limit} ALLOCATION SITES BY SIZE ({len(mem_files)} command(s))")
+            lines.append(f"{'KIB':>10} {'BLOCKS':>8}  LOCATION")
+            for location, (size, count) in sorted(totals.items(), key=lambda item: item[1][0], reverse=True)[:limit]:
+                lines.append(f"{size / 1024:>10.1f} {count:>8}  {location}")
+
+        if not prof_files and not mem_files:
+            lines.append("No profiles captured in this session")
+
+        return "\n".join(lines)
@@ -26,7 +26,9 @@ PUT_BODY_PATTERN = r"'(\w+)'\s*,\s*'(\w+:\w+)'\s*,\s*'([^']*)'"
 
 GET_PATTERN = r"^get\s+'(\w+)'\s*,\s*'(\w+)'\s*(?:,\s*\{COLUMN\s*=>\s*'(\w+:\w+)'\s*\})?$"
 
-SCAN_PATTERN = r"^scan\s+'(\w+)'"
+GET_ROWS_PATTERN = r"^get_rows\s+'(\w+)'\s*,\s*((?:'\w+'\s*,\s*)*'\w+')\s*$"
+
+SCAN_PATTERN = r"^scan\s+'(\w+)'(?:\s*,\s*\{([^{}]*)\})?"
 
 DELETE_PATTERN = r"^delete\s+'(\w+)'\s*,\s*'(\w+)'\s*,\s*'(\w+:\w+)'\s*"
 
@@ -35,3 +37,43 @@ DELETE_ALL_PATTERN = r"^delete_all\s+'(\w+)'\s*,\s*'(\w+)'\s*"
 COUNT_PATTERN = r"^count\s+'(\w+)'"
 
 TRUNCATE_PATTERN = r"^truncate\s+'(\w+)'"
+
+TRUNCATE_PRESERVE_PATTERN = r"^truncate_preserve\s+'(\w+)'\s*$"
+
+AGGREGATE_PATTERN = r"^aggregate\s+'(\w+)'\s*,\s*'(\w+)'\s*,\s*'(\w+:\w+)'(?:\s*,\s*\{([^{}]*)\})?\s*$"
+
+INCR_PATTERN = r"^incr\s+'(\w+)'\s*,\s*'(\w+)'\s*,\s*'(\w+:\w+)'(?:\s*,\s*(-?\d+))?\s*$"
+
+# '<value>' or nil (the cell must not exist)
+CHECK_AND_PUT_PATTERN = r"^check_and_put\s+'(\w+)'\s*,\s*'(\w+)'\s*,\s*'(\w+:\w+)'\s*,\s*'(=|!=|<|<=|>|>=)'\s*,\s*(?:'([^']*)'|(nil))\s*,\s*'(\w+:\w+)'\s*,\s*'([^']*)'\s*$"
+
+CHECK_AND_DELETE_PATTERN = r"^check_and_delete\s+'(\w+)'\s*,\s*'(\w+)'\s*,\s*'(\w+:\w+)'\s*,\s*'(=|!=|<|<=|>|>=)'\s*,\s*(?:'([^']*)'|(nil))(?:\s*,\s*'(\w+:\w+)')?\s*$"
+
+GET_COUNTER_PATTERN = r"^get_counter\s+'(\w+)'\s*,\s*'(\w+)'\s*,\s*'(\w+:\w+)'\s*$"
+
+# Maintenance
+FLUSH_PATTERN = r"^flush\s+'(\w+)'\s*$"
+
+COMPACT_PATTERN = r"^compact\s+'(\w+)'\s*$"
+
+MAJOR_COMPACT_PATTERN = r"^major_compact\s+'(\w+)'\s*$"
+
+STATUS_PATTERN = r"^status(?:\s+'(\w+)')?\s*$"
+
+# Replication
+ADD_PEER_PATTERN = r"^add_peer\s+'(\w+)'\s*,\s*'([^']+)'\s*$"
+
+REMOVE_PEER_PATTERN = r"^remove_peer\s+'(\w+)'\s*$"
+
+ENABLE_PEER_PATTERN = r"^enable_peer\s+'(\w+)'\s*$"
+
+DISABLE_PEER_PATTERN = r"^disable_peer\s+'(\w+)'\s*$"
+
+LIST_PEERS_PATTERN = r"^list_peers\s*$"
+
+# Tools
+FORMAT_PATTERN = r"^format\s+'(\w+)'\s*$"
+
+PROFILE_PATTERN = r"^profile\s+(on|off|cpu|memory|all)$"
+
+PROFILE_REPORT_PATTERN = r"^profile_report(?:\s+(\d+))?$"
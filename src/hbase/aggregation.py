@@ -0,0 +1,178 @@
+import bisect
+import math
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Union
+
+from hbase.table import entry_row_key, expiry_cutoffs
+
+try:
+    import numpy as np
+except ImportError:  # Optional, only used for floats, where it can differ from Python in the last bits
+    np = None
+
+AGGREGATIONS = ("rowcount", "sum", "min", "max", "avg", "std")
+
+# Below this many values the NumPy conversion costs more than it saves
+VECTORIZE_THRESHOLD = 1024
+
+
+@dataclass
+class PartialAggregate:
+    n_rows: int = 0
+    count: int = 0
+    sum: float = 0
+    mean: float = 0.0
+    m2: float = 0.0  # Sum of the squared deviations from the mean
+    sum_sq: Optional[int] = None  # Only kept when every value is an int, it is exact then
+    min: Optional[float] = None
+    max: Optional[float] = None
+
+    def merge(self, other: "PartialAggregate") -> "PartialAggregate":
+        if not self.count or not other.count:
+            values = self if self.count else other
+            return PartialAggregate(self.n_rows + other.n_rows, values.count, values.sum, values.mean, values.m2,
+                                    values.sum_sq, values.min, values.max)
+
+        # Chan et al. parallel variance, merging the M2 of both sides never subtracts large sums
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        return PartialAggregate(
+            n_rows=self.n_rows + other.n_rows,
+            count=count,
+            sum=self.sum + other.sum,
+            mean=self.mean + delta * other.count / count,
+            m2=self.m2 + other.m2 + delta * delta * self.count * other.count / count,
+            sum_sq=self.sum_sq + other.sum_sq if self.sum_sq is not None and other.sum_sq is not None else None,
+            min=min(self.min, other.min),
+            max=max(self.max, other.max),
+        )
+
+    def result(self, function: str) -> Union[int, float, None]:
+        if function == "rowcount":
+            return self.n_rows
+        if function == "sum":
+            return self.sum
+        if function == "min":
+            return self.min
+        if function == "max":
+            return self.max
+        if not self.count:
+            return None
+        avg = self.sum / self.count
+        if function == "avg":
+            return avg
+        # Population std, like HBase
+        if self.sum_sq is not None:
+            # n * sum_sq - sum ** 2 is n ** 2 times the variance, computed exactly on ints
+            return math.sqrt((self.count * self.sum_sq - self.sum * self.sum) / (self.count * self.count))
+        return math.sqrt(self.m2 / self.count)
+
+
+def to_number(value) -> Optional[Union[int, float]]:
+    # Counters are ints, other cells usually hold numbers as strings. Anything else is skipped.
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def reduce_values(values: List[Union[int, float]], n_rows: int) -> PartialAggregate:
+    if not values:
+        return PartialAggregate(n_rows=n_rows)
+
+    # Integers (counters) are summed by Python, exactly, float64 would round them above 2**53
+    if all(type(v) is int for v in values):
+        n = len(values)
+        total = sum(values)
+        sum_sq = sum(v * v for v in values)
+        return PartialAggregate(n_rows, n, total, total / n, (n * sum_sq - total * total) / n, sum_sq,
+                                min(values), max(values))
+
+    # Two passes, the deviations are taken from the mean so the variance of large values is not lost
+    if np is not None and len(values) >= VECTORIZE_THRESHOLD:
+        array = np.asarray(values, dtype=np.float64)
+        mean = float(array.mean())
+        deviations = array - mean
+        return PartialAggregate(n_rows, len(values), float(array.sum()), mean, float(np.dot(deviations, deviations)),
+                                None, float(array.min()), float(array.max()))
+
+    total = math.fsum(values)
+    mean = total / len(values)
+    return PartialAggregate(n_rows, len(values), total, mean, math.fsum((v - mean) ** 2 for v in values), None,
+                            min(values), max(values))
+
+
+def partial_aggregate(table, column_family: str, column_qualifier: str, start_row: Optional[str],
+                      stop_row: Optional[str]) -> PartialAggregate:
+    # Only the value extraction holds the table lock, the reduction runs outside of it
+    values = []
+    n_rows = 0
+    with table.lock:
+        data = table.data
+        cutoff, min_versions = expiry_cutoffs(table.policies).get(column_family, (None, 0))
+        i = bisect.bisect_left(data, start_row, key=entry_row_key) if start_row else 0
+        while i < len(data) and (not stop_row or data[i].row_key < stop_row):
+            entry = data[i]
+            i += 1
+            if entry.column_family != column_family:
+                continue
+            cell = entry.column_qualifiers.get(column_qualifier)
+            if not cell:
+                continue
+            last_version = cell[f"version{cell['n_versions']}"]
+            if cutoff is not None and not min_versions and last_version["timestamp"] < cutoff:
+                continue  # Expired
+            n_rows += 1
+            value = to_number(last_version["value"])
+            if value is not None:
+                values.append(value)
+
+    return reduce_values(values, n_rows)
+
+
+def split_range(table, start_row: Optional[str], stop_row: Optional[str], n_parts: int) -> List[tuple]:
+    # Splits [start_row, stop_row) in row key ranges of about the same number of entries
+    bounds = [start_row]
+    with table.lock:
+        data = table.data
+        lo = bisect.bisect_left(data, start_row, key=entry_row_key) if start_row else 0
+        hi = bisect.bisect_left(data, stop_row, key=entry_row_key) if stop_row else len(data)
+        for part in range(1, n_parts):
+            key = data[lo + (hi - lo) * part // n_parts].row_key if hi > lo else None
+            if key and key != bounds[-1]:
+                bounds.append(key)
+    bounds.append(stop_row)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def aggregate(table, function: str, column_family: str, column_qualifier: str, start_row: Optional[str] = None,
+              stop_row: Optional[str] = None, n_threads: int = 1) -> Union[int, float, None]:
+    # Endpoint in the spirit of HBase's AggregateImplementation. Every range computes a partial
+    # aggregate (count, sum, mean, M2, min, max) and the partials are merged at the end.
+    if function not in AGGREGATIONS:
+        raise Exception(f"Unknown aggregation '{function}'. Use one of: {', '.join(AGGREGATIONS)}")
+    if table.metadata.is_disabled:
+        raise Exception("Failed to aggregate: Table is disabled.")
+    if not table.get_column_family(column_family):
+        raise Exception(f"Column family '{column_family}' not found")
+
+    if n_threads <= 1:
+        return partial_aggregate(table, column_family, column_qualifier, start_row, stop_row).result(function)
+
+    ranges = split_range(table, start_row, stop_row, n_threads)
+    total = PartialAggregate()
+    with ThreadPoolExecutor(max_workers=n_threads) as executor:
+        partials = executor.map(lambda r: partial_aggregate(table, column_family, column_qualifier, *r), ranges)
+        for partial in partials:
+            total = total.merge(partial)
+
+    return total.result(function)
@@ -0,0 +1,172 @@
+import asyncio
+import itertools
+import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import AsyncIterator, Dict, List, Optional
+
+from hbase.hbase import Hbase
+from hbase.server import DEFAULT_PORT, MAX_LINE_SIZE, METHODS, decode_value
+from hbase.table_dataclasses import Result
+
+
+class AsyncTable:
+    # Handle returned by AsyncHbase.table, every method is one request
+    def __init__(self, client: "AsyncHbase", name: str):
+        self.client = client
+        self.name = name
+
+    async def get(self, row_key: str, column_family: Optional[str] = None,
+                  column_qualifier: Optional[str] = None) -> Result:
+        return await self.client.call("get_row", self.name, row_key, column_family, column_qualifier)
+
+    async def get_rows(self, row_keys: List[str], columns: Optional[List[str]] = None,
+                       versions: int = 1) -> List[Result]:
+        return await self.client.call("get_rows", self.name, row_keys, columns, versions)
+
+    async def put(self, row_key: str, column_family: str, column_qualifier: str, value) -> None:
+        await self.client.call("put", self.name, row_key, column_family, column_qualifier, value)
+
+    async def delete(self, row_key: str, column_family: str, column_qualifier: str) -> None:
+        await self.client.call("delete", self.name, row_key, column_family, column_qualifier)
+
+    async def delete_all(self, row_key: str) -> int:
+        return await self.client.call("delete_all", self.name, row_key)
+
+    async def increment(self, row_key: str, column_family: str, column_qualifier: str, delta: int = 1) -> int:
+        return await self.client.call("increment", self.name, row_key, column_family, column_qualifier, delta)
+
+    async def count(self) -> int:
+        return await self.client.call("count", self.name)
+
+    async def scan(self, start_row: Optional[str] = None, stop_row: Optional[str] = None,
+                   batch_size: int = 100) -> AsyncIterator[Result]:
+        # Fetched in pages of batch_size rows. The next page is requested before the rows of the
+        # current one are handed out, so it is usually ready when they are consumed.
+        page = asyncio.ensure_future(self.client.call("scan", self.name, start_row, stop_row, batch_size))
+        try:
+            while page:
+                results = await page
+                page = None
+                if len(results) == batch_size:
+                    # Smallest row key after the last one returned
+                    next_row = results[-1].row_key + "\0"
+                    page = asyncio.ensure_future(self.client.call("scan", self.name, next_row, stop_row, batch_size))
+                for result in results:
+                    yield result
+        finally:
+            if page and not page.done():  # The caller stopped early
+                page.cancel()
+
+
+class AsyncHbase:
+    # asyncio client. Given a data_dir the database runs in-process and every call is sent to a
+    # thread pool, so loading, searching and saving tables never blocks the event loop. Given a host
+    # it talks to a server (python -m hbase.server) over a single connection. Calls are pipelined:
+    # any number can be in flight at once, responses are matched to them by request id.
+    def __init__(self, data_dir: Optional[str] = None, host: Optional[str] = None, port: int = DEFAULT_PORT,
+                 max_workers: int = 8, **hbase_options):
+        if (data_dir is None) == (host is None):
+            raise Exception("Either a data_dir (in-process) or a host (server) is required")
+        self.data_dir = data_dir
+        self.host = host
+        self.port = port
+        self.max_workers = max_workers
+        self.hbase_options = hbase_options
+
+        # In-process
+        self.hbase: Optional[Hbase] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        # Server
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._read_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+
+    async def __aenter__(self) -> "AsyncHbase":
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def open(self) -> None:
+        if self.data_dir is not None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="hbase-async")
+            loop = asyncio.get_running_loop()
+            self.hbase = await loop.run_in_executor(self._executor, partial(Hbase, self.data_dir, **self.hbase_options))
+        else:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port, limit=MAX_LINE_SIZE)
+            self._read_task = asyncio.create_task(self._read_responses())
+
+    async def close(self) -> None:
+        if self.hbase is not None:
+            # Waits for the pending flushes
+            await asyncio.get_running_loop().run_in_executor(self._executor, self.hbase.close)
+            self.hbase = None
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except ConnectionError:
+                pass
+            await self._read_task
+            self._writer = None
+
+    def table(self, table_name: str) -> AsyncTable:
+        return AsyncTable(self, table_name)
+
+    async def list_tables(self, regex: Optional[str] = None) -> List[str]:
+        return await self.call("list_tables", regex)
+
+    async def create_table(self, table_name: str, column_families: List[str]) -> None:
+        await self.call("create_table", table_name, column_families)
+
+    async def flush_all(self) -> None:
+        await self.call("flush_all")
+
+    async def call(self, method: str, *args, **kwargs):
+        if method not in METHODS:
+            raise Exception(f"Unknown method '{method}'")
+
+        if self.hbase is not None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(getattr(self.hbase, method), *args, **kwargs))
+
+        if self._writer is None:
+            raise Exception("The client is not connected, use 'async with AsyncHbase(...)'")
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            request = {"id": request_id, "method": method, "args": list(args), "kwargs": kwargs}
+            self._writer.write(json.dumps(request, ensure_ascii=False).encode("utf-8") + b"\n")
+            await self._writer.drain()
+            return await future
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def _read_responses(self) -> None:
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                future = self._pending.get(response["id"])
+                if future is None or future.done():  # The call was cancelled
+                    continue
+                if response.get("error") is not None:
+                    future.set_exception(Exception(response["error"]))
+                else:
+                    future.set_result(decode_value(response.get("result")))
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(Exception("Connection to the server closed"))
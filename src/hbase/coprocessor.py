@@ -0,0 +1,34 @@
+from typing import Any, Optional
+
+
+class RegionObserver:
+    # Hooks called around the mutations of a table, registered with Table.register_observer.
+    # Subclasses override the hooks they need. Raising an exception in a pre_ hook cancels the
+    # mutation. post_ hooks also receive what the mutation returned.
+    def pre_put(self, table, row_key: str, column_family: str, column_qualifier: str, value: Any,
+                timestamp: Optional[str] = None) -> None:
+        pass
+
+    def post_put(self, table, result: None, row_key: str, column_family: str, column_qualifier: str,
+                 value: Any, timestamp: Optional[str] = None) -> None:
+        pass
+
+    def pre_delete(self, table, row_key: str, column_family: str, column_qualifier: str) -> None:
+        pass
+
+    def post_delete(self, table, result: None, row_key: str, column_family: str, column_qualifier: str) -> None:
+        pass
+
+    def pre_delete_all(self, table, row_key: str) -> None:
+        pass
+
+    def post_delete_all(self, table, result: int, row_key: str) -> None:
+        pass
+
+    def pre_increment(self, table, row_key: str, column_family: str, column_qualifier: str, delta: int = 1,
+                      timestamp: Optional[str] = None) -> None:
+        pass
+
+    def post_increment(self, table, result: int, row_key: str, column_family: str, column_qualifier: str,
+                       delta: int = 1, timestamp: Optional[str] = None) -> None:
+        pass
@@ -1,50 +1,201 @@
 import os
 import re
-from typing import List
-
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Union
+
+from hbase.aggregation import aggregate
+from hbase.coprocessor import RegionObserver
+from hbase.maintenance import MaintenanceScheduler
+from hbase.mapped_table import MappedTable
+from hbase.replication import ReplicationManager
+from hbase.storage import TEMP_SUFFIX, quarantine
 from hbase.table import Table
+from hbase.table_dataclasses import Condition, MetaData, Mutation, Result, RowEntry
 
 
-def load_tables(data_dir: str) -> List[Table]:
-    tables = []
+def load_tables(data_dir: str) -> Dict[str, Table]:
+    tables = {}
 
     for file in os.listdir(data_dir):
-        if file.endswith(".json"):
+        path = os.path.join(data_dir, file)
+        if file.endswith(TEMP_SUFFIX):  # Leftover of an interrupted save, the original file is intact
+            os.remove(path)
+        elif file.endswith(".json"):
             table = Table()
-            table.load(os.path.join(data_dir, file))
-            tables.append(table)
+            try:
+                table.load(path)
+            except Exception as e:
+                # A corrupted table must not prevent the rest of the database from starting
+                new_path = quarantine(path)
+                print(f"Warning: could not load '{file}' ({e}). Moved to '{new_path}'")
+                continue
+            tables[table.metadata.name] = table
 
     return tables
 
 
 class Hbase:
-    def __init__(self, data_dir: str):
+    def __init__(self, data_dir: str, flush_delay: float = 1.0, n_maintenance_threads: int = 2,
+                 max_unflushed_edits: int = 10000, reap_interval: float = 60.0, reap_batch_size: int = 1000):
         self.data_dir = data_dir
-        self.tables: List[Table] = load_tables(data_dir)
+        self.reap_interval = reap_interval
+        self.reap_batch_size = reap_batch_size
+        self._reap_cursors: Dict[str, Optional[str]] = {}  # Where the reaper continues in each table
+        self.tables: Dict[str, Table] = load_tables(data_dir)  # Indexed by name
+        self._garbage: Dict[str, List[List[RowEntry]]] = {}  # Rows of truncated tables waiting to be freed
+        self._garbage_lock = threading.Lock()
+
+        # Writes only change the in-memory table, persisting them is done in the background
+        self.maintenance = MaintenanceScheduler(
+            handlers={
+                "flush": self._flush_task,
+                "compact": self._compact_task,
+                "major_compact": self._major_compact_task,
+                "reap": self._reap_task,
+                "reclaim": self._reclaim_task,
+            },
+            n_threads=n_maintenance_threads,
+            flush_delay=flush_delay,
+            max_unflushed_edits=max_unflushed_edits,
+        )
+
+        # Coprocessor endpoints, called as endpoint(table, *args, **kwargs) inside the engine
+        self.endpoints: Dict[str, Callable] = {"aggregate": aggregate}
+
+        # Ships the edits of families with REPLICATION_SCOPE => '1' to the peers
+        self.replication = ReplicationManager(self)
+        for table in self.tables.values():
+            table.register_observer(self.replication.observer)
+            self._schedule_reap(table)
+
+    def _save(self, table: Table) -> None:
+        # Synchronous save, used by the DDL commands. It also persists any unflushed write. Marked
+        # clean first, a write made during the save may miss it and needs its own flush.
+        self.maintenance.mark_clean(table.metadata.name)
+        table.save(self.data_dir)
+
+    def _mark_dirty(self, table: Table, throttle: bool = True) -> None:
+        self.maintenance.mark_dirty(table.metadata.name, throttle)
+
+    def _find_table(self, table_name: str) -> Optional[Table]:
+        return self.tables.get(table_name)
+
+    def _flush_task(self, table_name: str) -> None:
+        table = self._find_table(table_name)
+        if not table:  # Dropped while the flush was queued
+            return
+        with table.save_lock:  # A drop waits for it
+            if self.tables.get(table_name) is table:
+                table.save(self.data_dir)
+
+    def _compact_task(self, table_name: str) -> None:
+        table = self._find_table(table_name)
+        if table and table.compact():
+            self._mark_dirty(table, throttle=False)
+
+    def _major_compact_task(self, table_name: str) -> None:
+        table = self._find_table(table_name)
+        if not table:
+            return
+        self.maintenance.mark_clean(table_name)
+        with table.save_lock:
+            table.compact(major=True)
+            if self.tables.get(table_name) is table:
+                table.save(self.data_dir)
+
+    def _schedule_reap(self, table: Table, delay: float = 0.0) -> None:
+        if any(policy.ttl is not None for policy in table.policies.values()):
+            self.maintenance.submit("reap", table.metadata.name, delay)
+
+    def _reap_task(self, table_name: str) -> None:
+        # One batch of the TTL reaper. The next batch is queued as a new task, so flushes and the
+        # other tables get their turn and commands only wait for the table lock of a single batch.
+        table = self._find_table(table_name)
+        if not table:
+            self._reap_cursors.pop(table_name, None)
+            return
+        if table.metadata.is_disabled:
+            self._schedule_reap(table, self.reap_interval)
+            return
+
+        removed, cursor = table.reap(self._reap_cursors.get(table_name), self.reap_batch_size)
+        if removed:
+            self._mark_dirty(table, throttle=False)
+
+        if cursor is None:  # Pass done, the next one starts over after the interval
+            self._reap_cursors.pop(table_name, None)
+            self._schedule_reap(table, self.reap_interval)
+        else:
+            self._reap_cursors[table_name] = cursor
+            self.maintenance.submit("reap", table_name)
+
+    def _reclaim_task(self, table_name: str) -> None:
+        # Frees the rows of truncated or dropped tables outside of the request that removed them
+        with self._garbage_lock:
+            garbage = self._garbage.pop(table_name, [])
+        for data in garbage:
+            data.clear()
+
+    def _retire(self, table_name: str, data: List[RowEntry]) -> None:
+        if data:
+            with self._garbage_lock:
+                self._garbage.setdefault(table_name, []).append(data)
+            self.maintenance.submit("reclaim", table_name)
+
+    def flush(self, table_name: str) -> None:
+        self.maintenance.submit("flush", self.get_table(table_name).metadata.name)
+
+    def compact(self, table_name: str) -> None:
+        self.maintenance.submit("compact", self.get_table(table_name).metadata.name)
+
+    def major_compact(self, table_name: str) -> None:
+        self.maintenance.submit("major_compact", self.get_table(table_name).metadata.name)
+
+    def flush_all(self) -> None:
+        # Runs every queued maintenance task now and waits for them
+        self.maintenance.wait_idle()
+
+    def close(self) -> None:
+        self.flush_all()
+        self.replication.stop()
+        self.maintenance.stop()
 
     def create_table(self, table_name: str, column_families: list[str]) -> None:
+        if table_name in self.tables:
+            raise Exception(f"Table '{table_name}' already exists")
+
         new_table = Table(table_name, column_families)
+        new_table.register_observer(self.replication.observer)
 
         # Save the table to the data directory
-        new_table.save(self.data_dir)
+        self._save(new_table)
 
-        self.tables.append(new_table)
+        self.tables[table_name] = new_table
 
     def list_tables(self, regex: str = None) -> List[str]:
-        table_names = []
-        for table in self.tables:
-            if not regex or re.match(regex, table.metadata.name):
-                table_names.append(table.metadata.name)
+        return [table.metadata.name for table in self._match_tables(regex)]
 
-        return table_names
+    def _match_tables(self, regex: Optional[str] = None) -> List[Table]:
+        if not regex:
+            return list(self.tables.values())
+        pattern = re.compile(regex)
+        return [table for name, table in self.tables.items() if pattern.match(name)]
 
     def get_table(self, table_name: str) -> Table:
-        for table in self.tables:
-            if table.metadata.name == table_name:
-                return table
+        table = self._find_table(table_name)
+        if table:
+            return table
 
         raise Exception(f"Table '{table_name}' not found")
 
+    def open_mapped(self, table_name: str) -> MappedTable:
+        # Read-only access straight from the table file, without loading it into memory
+        path = os.path.join(self.data_dir, f"{table_name}.json")
+        if not os.path.exists(path):
+            raise Exception(f"Table '{table_name}' not found")
+        return MappedTable(path)
+
     def disable_table(self, table_name: str) -> None:
         table = self.get_table(table_name)
         if table.metadata.is_disabled:
@@ -52,7 +203,7 @@ class Hbase:
             return
 
         table.disable()
-        table.save(self.data_dir)
+        self._save(table)
 
     def is_table_disabled(self, table_name: str) -> bool:
         table = self.get_table(table_name)
@@ -65,7 +216,7 @@ class Hbase:
             return
 
         table.enable()
-        table.save(self.data_dir)
+        self._save(table)
 
     def is_table_enabled(self, table_name: str) -> bool:
         table = self.get_table(table_name)
@@ -77,18 +228,26 @@ class Hbase:
         if not table.metadata.is_disabled:
             raise Exception(f"Table '{table_name}' must be disabled before it can be dropped")
 
-        self.tables.remove(table)  # Remove it from the list
+        self._drop(table)
 
-        os.remove(os.path.join(self.data_dir, f"{table_name}.json"))  # Remove the file
+    def _drop(self, table: Table) -> None:
+        table_name = table.metadata.name
+        self.maintenance.cancel(table_name)
+        with table.save_lock, table.lock:  # Waits for a flush in progress
+            del self.tables[table_name]
+
+            os.remove(os.path.join(self.data_dir, f"{table_name}.json"))  # Remove the file
+        self._retire(table_name, table.truncate())
 
     def drop_all_tables(self, regex: str) -> int:
-        tables = self.list_tables(regex)
+        # One pass over the tables, the matches are dropped without looking them up again
+        tables = self._match_tables(regex)
 
         can_be_disabled = True
         # Print table names
         for table in tables:
-            text = table
-            if not self.is_table_disabled(text):
+            text = table.metadata.name
+            if not table.metadata.is_disabled:
                 text += " must be disabled before it can be dropped"
                 can_be_disabled = False
             print(text)
@@ -105,45 +264,28 @@ class Hbase:
 
         # Drop the tables
         for table in tables:
-            self.drop_table(table)
+            self._drop(table)
 
         return len(tables)
 
-    def truncate_table(self, table_name: str) -> None:
+    def truncate_table(self, table_name: str, preserve: bool = False) -> None:
+        # The table object stays registered and keeps its schema, only its storage is swapped.
+        # The old rows are freed by a background task.
         table = self.get_table(table_name)
 
-        cfs = table.metadata.column_families
-        print(f"Truncating '{table_name}' (it may take a while):")
-        print(f" - Disabling table...")
-        self.disable_table(table_name)
-        print(f" - Truncating table...")
-        self.drop_table(table_name)
-        self.create_table(table_name, [cf.name for cf in cfs])
+        with table.save_lock:
+            with table.lock:
+                data = table.truncate(preserve)
+                table.enable()
+            self._save(table)
+        self._retire(table_name, data)
 
-    def describe_table(self, table_name: str) -> tuple[str, int]:
-        table = self.get_table(table_name)
+    def truncate_preserve(self, table_name: str) -> None:
+        # Like truncate, but the table also keeps its id and creation time
+        self.truncate_table(table_name, preserve=True)
 
-        table_description = f"Table {table.metadata.name} is {'DISABLED' if table.metadata.is_disabled else 'ENABLED'}\n"
-        table_description += table.metadata.name
-        table_description += "\nCOLUMN FAMILIES DESCRIPTION\n"
-        for column_family in table.metadata.column_families:
-            table_description += "{"
-            table_description += f"NAME => '{column_family.name}', "
-            table_description += f"DATA_BLOCK_ENCODING => '{column_family.data_block_encoding}', "
-            table_description += f"BLOOMFILTER => '{column_family.bloomfilter}', "
-            table_description += f"REPLICATION_SCOPE => '{column_family.replication_scope}', "
-            table_description += f"VERSIONS => '{column_family.versions}', "
-            table_description += f"COMPRESSION => '{column_family.compression}', "
-            table_description += f"MIN_VERSIONS => '{column_family.min_versions}', "
-            table_description += f"TTL => '{column_family.ttl}', "
-            table_description += f"KEEP_DELETED_CELLS => '{column_family.keep_deleted_cells}', "
-            table_description += f"BLOCK_SIZE => '{column_family.block_size}', "
-            table_description += f"IN_MEMORY => '{column_family.in_memory}', "
-            table_description += f"BLOCK_CACHE => '{column_family.block_cache}'"
-            table_description += "}\n"
-        table_description = table_description[:-1]  # Remove the last newline
-
-        return table_description, len(table.metadata.column_families)
+    def describe_table(self, table_name: str) -> MetaData:
+        return self.get_table(table_name).metadata
 
     def alter_table(self, table_name: str, properties: dict) -> None:
         table = self.get_table(table_name)
@@ -157,7 +299,9 @@ class Hbase:
             # Remove the column family from the list
             table.delete_column_family(cf_name)
 
-            table.save(self.data_dir)
+            self._save(table)
+            # Its cells are dropped from the data in the background
+            self.maintenance.submit("major_compact", table_name)
             return
 
         cf = self.get_table(table_name).get_column_family(cf_name)
@@ -169,68 +313,138 @@ class Hbase:
         else:
             self.get_table(table_name).update_column_family(cf_name, properties)
 
-        table.save(self.data_dir)
+        self._save(table)
+        # A new TTL starts being enforced on the stored data right away
+        self._schedule_reap(table)
 
-    def put(self, table_name: str, row_key: str, column_family: str, column_qualifier: str, value: str) -> None:
+    def put(self, table_name: str, row_key: str, column_family: str, column_qualifier: str, value: str,
+            timestamp: Optional[str] = None) -> None:
         table = self.get_table(table_name)
 
-        table.put(row_key, column_family, column_qualifier, value)
+        table.put(row_key, column_family, column_qualifier, value, timestamp)
 
-        table.save(self.data_dir)
+        self._mark_dirty(table)
+
+    def increment(self, table_name: str, row_key: str, column_family: str, column_qualifier: str, delta: int = 1,
+                  timestamp: Optional[str] = None) -> int:
+        table = self.get_table(table_name)
+
+        value = table.increment(row_key, column_family, column_qualifier, delta, timestamp)
+
+        # Increments to the same table before the flush runs are persisted together
+        self._mark_dirty(table)
+
+        return value
+
+    def get_counter(self, table_name: str, row_key: str, column_family: str, column_qualifier: str) -> Optional[int]:
+        return self.get_table(table_name).get_counter(row_key, column_family, column_qualifier)
+
+    def check_and_mutate(self, table_name: str, conditions: List[Condition], mutations: List[Mutation]) -> bool:
+        table = self.get_table(table_name)
+
+        applied = table.check_and_mutate(conditions, mutations)
+        if applied:
+            self._mark_dirty(table)
+
+        return applied
+
+    def check_and_put(self, table_name: str, row_key: str, column_family: str, column_qualifier: str, op: str,
+                      expected, put_column_family: str, put_column_qualifier: str, value, numeric: bool = False) -> bool:
+        return self.check_and_mutate(
+            table_name,
+            [Condition(row_key, column_family, column_qualifier, op, expected, numeric)],
+            [Mutation(row_key, put_column_family, put_column_qualifier, value)],
+        )
+
+    def check_and_delete(self, table_name: str, row_key: str, column_family: str, column_qualifier: str, op: str,
+                         expected, delete_column_family: Optional[str] = None,
+                         delete_column_qualifier: Optional[str] = None, numeric: bool = False) -> bool:
+        return self.check_and_mutate(
+            table_name,
+            [Condition(row_key, column_family, column_qualifier, op, expected, numeric)],
+            [Mutation(row_key, delete_column_family or column_family,
+                      delete_column_qualifier or column_qualifier, method="delete")],
+        )
 
     def delete(self, table_name: str, row_key: str, column_family: str, column_qualifier: str) -> None:
         table = self.get_table(table_name)
 
         table.delete(row_key, column_family, column_qualifier)
 
-        table.save(self.data_dir)
+        self._mark_dirty(table)
 
     def delete_all(self, table_name: str, row_key: str) -> int:
         table = self.get_table(table_name)
 
         n_rows = table.delete_all(row_key)
 
-        table.save(self.data_dir)
+        self._mark_dirty(table)
 
         return n_rows
 
-    def scan(self, table_name: str) -> str:
+    def scan(self, table_name: str, start_row: Optional[str] = None, stop_row: Optional[str] = None,
+             limit: Optional[int] = None) -> List[Result]:
         table = self.get_table(table_name)
 
-        return table.scan()
+        return table.scan(start_row, stop_row, limit)
 
     def count(self, table_name: str) -> int:
         return self.get_table(table_name).count()
 
-    def get_row(self, table_name: str, row_key: str, column_family: str = None, column_qualifier: str = None) -> tuple[str, int]:
+    def get_rows(self, table_name: str, row_keys: List[str], columns: Optional[List[str]] = None,
+                 versions: int = 1, n_threads: int = 1) -> List[Result]:
         table = self.get_table(table_name)
-        if table.metadata.is_disabled:
-            raise Exception("Failed 1 action: NotServingRegionException: 1 time,")
-
-        n_rows = 0
-        return_str = "COLUMN\t\t\t\t\t\tCELL\n"
-        if not column_family or not column_qualifier:  # Show all columns
-            for entry in table.data:
-                if entry.row_key == row_key:
-                    for cq, values in entry.column_qualifiers.items():
-                        last_version = f"version{values['n_versions']}"
-                        for version, value in values.items():
-                            if version == "n_versions" or version != last_version:
-                                continue
-                            return_str += f"{entry.column_family}:{cq}\t\t\t\ttimestamp={value['timestamp']}, value={value['value']}\n"
-                            n_rows += 1
-
-            return return_str, n_rows
-
-        # Show only the specified column
-        for entry in table.data:
-            if entry.row_key == row_key and entry.column_family == column_family:
-                if column_qualifier in entry.column_qualifiers:
-                    values = entry.column_qualifiers[column_qualifier]
-                    last_version = f"version{values['n_versions']}"
-                    for version, value in values.items():
-                        if version == "n_versions" or version != last_version:
-                            continue
-                        return_str += f"{entry.column_family}:{column_qualifier}\t\t\t\ttimestamp={value['timestamp']}, value={value['value']}\n"
-
-        return return_str, 1
+
+        row_keys = sorted(set(row_keys))
+        if n_threads <= 1 or len(row_keys) < 2 * n_threads:
+            return table.get_rows(row_keys, columns, versions)
+
+        # Contiguous key ranges, each resolved by its own pass. The table lock is taken per range,
+        # so writers can interleave with a long multi-get.
+        size = -(-len(row_keys) // n_threads)
+        chunks = [row_keys[i:i + size] for i in range(0, len(row_keys), size)]
+        results = []
+        with ThreadPoolExecutor(max_workers=n_threads) as executor:
+            for partial in executor.map(lambda chunk: table.get_rows(chunk, columns, versions), chunks):
+                results.extend(partial)
+
+        return results
+
+    def register_endpoint(self, name: str, endpoint: Callable) -> None:
+        self.endpoints[name] = endpoint
+
+    def call_endpoint(self, table_name: str, name: str, *args, **kwargs):
+        if name not in self.endpoints:
+            raise Exception(f"Endpoint '{name}' not found")
+        return self.endpoints[name](self.get_table(table_name), *args, **kwargs)
+
+    def register_observer(self, table_name: str, observer: RegionObserver) -> None:
+        self.get_table(table_name).register_observer(observer)
+
+    def aggregate(self, table_name: str, function: str, column_family: str, column_qualifier: str,
+                  start_row: Optional[str] = None, stop_row: Optional[str] = None,
+                  n_threads: int = 1) -> Union[int, float, None]:
+        return self.call_endpoint(table_name, "aggregate", function, column_family, column_qualifier,
+                                  start_row, stop_row, n_threads)
+
+    def add_peer(self, peer_id: str, path: str) -> None:
+        self.replication.add_peer(peer_id, path)
+
+    def remove_peer(self, peer_id: str) -> None:
+        self.replication.remove_peer(peer_id)
+
+    def enable_peer(self, peer_id: str) -> None:
+        self.replication.set_peer_enabled(peer_id, True)
+
+    def disable_peer(self, peer_id: str) -> None:
+        self.replication.set_peer_enabled(peer_id, False)
+
+    def list_peers(self) -> List[dict]:
+        return self.replication.status()
+
+    def get_peer(self, peer_id: str) -> "Hbase":
+        # Replica to offload reads to
+        return self.replication.get_peer_db(peer_id)
+
+    def get_row(self, table_name: str, row_key: str, column_family: str = None, column_qualifier: str = None) -> Result:
+        return self.get_table(table_name).get_row(row_key, column_family, column_qualifier)
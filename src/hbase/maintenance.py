@@ -0,0 +1,219 @@
+import heapq
+import itertools
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Lower runs first once due
+PRIORITIES = {
+    "flush": 0,
+    "compact": 1,
+    "major_compact": 2,
+    "reap": 3,
+    "reclaim": 4,
+}
+
+# Tasks that keep rescheduling themselves, wait_idle does not wait for them
+RECURRING = {"reap"}
+
+
+@dataclass
+class MaintenanceTask:
+    kind: str
+    table_name: str
+    due: float
+    priority: int
+    seq: int = field(default=0)
+
+
+class MaintenanceScheduler:
+    # Thread pool that runs the persistence and compaction work of the tables in the background.
+    # Tasks wait in a delay queue until due, then run by priority. Only one task per (kind, table)
+    # is queued at a time, so a burst of writes to a table ends up in a single flush.
+    def __init__(self, handlers: Dict[str, Callable[[str], None]], n_threads: int = 2, flush_delay: float = 1.0,
+                 max_unflushed_edits: int = 10000):
+        self.handlers = handlers
+        self.flush_delay = flush_delay
+        self.max_unflushed_edits = max_unflushed_edits
+
+        self._cond = threading.Condition()
+        self._delayed: List[Tuple[float, int, MaintenanceTask]] = []
+        self._ready: List[Tuple[int, int, MaintenanceTask]] = []
+        self._queued: Dict[Tuple[str, str], MaintenanceTask] = {}
+        self._running: List[MaintenanceTask] = []
+        self._seq = itertools.count()
+        self._stopped = False
+
+        self.unflushed_edits: Dict[str, int] = {}
+        self.n_completed = 0
+        self.n_failed = 0
+        self.n_throttled = 0
+        self.last_error: Optional[str] = None
+
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"hbase-maintenance-{i}", daemon=True)
+            for i in range(n_threads)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, kind: str, table_name: str, delay: float = 0.0) -> MaintenanceTask:
+        if kind not in self.handlers:
+            raise Exception(f"Unknown maintenance task '{kind}'")
+
+        with self._cond:
+            due = time.monotonic() + delay
+            task = self._queued.get((kind, table_name))
+            if task:
+                # Already queued, only bring it forward if requested sooner
+                if due < task.due:
+                    self._reschedule(task, due)
+                return task
+
+            task = MaintenanceTask(kind, table_name, due, PRIORITIES.get(kind, len(PRIORITIES)), next(self._seq))
+            self._queued[(kind, table_name)] = task
+            self._push(task)
+            return task
+
+    def mark_dirty(self, table_name: str, throttle: bool = True) -> None:
+        # Called after every write, schedules the delayed flush and throttles the writer if the
+        # flushes are falling behind. Tasks must not be throttled: they would wait for a flush that
+        # only a worker can run. Only the foreground writers wait.
+        throttle = throttle and threading.current_thread() not in self._threads
+        with self._cond:
+            self.unflushed_edits[table_name] = self.unflushed_edits.get(table_name, 0) + 1
+
+            if sum(self.unflushed_edits.values()) >= self.max_unflushed_edits:
+                for name in self.unflushed_edits:
+                    self.submit("flush", name)
+                if not throttle:
+                    return
+                self.n_throttled += 1
+                while sum(self.unflushed_edits.values()) >= self.max_unflushed_edits and not self._stopped:
+                    self._cond.wait(timeout=0.1)
+                return
+
+        self.submit("flush", table_name, self.flush_delay)
+
+    def mark_clean(self, table_name: str) -> None:
+        # The table was persisted outside of a flush task
+        with self._cond:
+            self.unflushed_edits.pop(table_name, None)
+            task = self._queued.get(("flush", table_name))
+            if task:
+                self._remove(task)
+            self._cond.notify_all()
+
+    def cancel(self, table_name: str) -> None:
+        with self._cond:
+            for task in [t for t in self._queued.values() if t.table_name == table_name]:
+                self._remove(task)
+            self.unflushed_edits.pop(table_name, None)
+            self._cond.notify_all()
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        # Runs every queued task now and waits for the queue to drain
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._cond:
+            for task in list(self._queued.values()):
+                if task.kind not in RECURRING:
+                    self._reschedule(task, time.monotonic())
+            self._cond.notify_all()
+
+            while self._pending():
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(timeout=remaining)
+        return True
+
+    def _pending(self) -> bool:
+        return any(t.kind not in RECURRING for t in itertools.chain(self._queued.values(), self._running))
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+    def status(self) -> dict:
+        now = time.monotonic()
+        with self._cond:
+            return {
+                "queued": [
+                    (t.kind, t.table_name, max(t.due - now, 0.0))
+                    for t in sorted(self._queued.values(), key=lambda t: (t.due, t.priority))
+                ],
+                "running": [(t.kind, t.table_name) for t in self._running],
+                "unflushed_edits": dict(self.unflushed_edits),
+                "completed": self.n_completed,
+                "failed": self.n_failed,
+                "throttled": self.n_throttled,
+                "last_error": self.last_error,
+            }
+
+    def _push(self, task: MaintenanceTask) -> None:
+        heapq.heappush(self._delayed, (task.due, task.seq, task))
+        self._cond.notify()
+
+    def _remove(self, task: MaintenanceTask) -> None:
+        # Lazy removal, the heaps skip entries whose task is no longer queued
+        self._queued.pop((task.kind, task.table_name), None)
+        task.seq = next(self._seq)
+
+    def _reschedule(self, task: MaintenanceTask, due: float) -> None:
+        # The old heap entry goes stale because its seq no longer matches
+        task.seq = next(self._seq)
+        task.due = due
+        self._push(task)
+
+    def _next_task(self) -> Optional[MaintenanceTask]:
+        # Must be called holding the condition
+        while not self._stopped:
+            now = time.monotonic()
+            while self._delayed and self._delayed[0][0] <= now:
+                _, seq, task = heapq.heappop(self._delayed)
+                if seq == task.seq and self._queued.get((task.kind, task.table_name)) is task:
+                    heapq.heappush(self._ready, (task.priority, seq, task))
+
+            while self._ready:
+                _, seq, task = heapq.heappop(self._ready)
+                if seq == task.seq and self._queued.get((task.kind, task.table_name)) is task:
+                    del self._queued[(task.kind, task.table_name)]
+                    return task
+
+            timeout = self._delayed[0][0] - now if self._delayed else None
+            self._cond.wait(timeout=timeout)
+        return None
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                task = self._next_task()
+                if task is None:
+                    return
+                self._running.append(task)
+                if task.kind == "flush":
+                    # Edits made from now on need another flush
+                    self.unflushed_edits.pop(task.table_name, None)
+                    self._cond.notify_all()
+
+            try:
+                self.handlers[task.kind](task.table_name)
+                failed = False
+            except Exception as e:
+                failed = True
+                self.last_error = f"{task.kind} '{task.table_name}': {e}"
+
+            with self._cond:
+                self._running.remove(task)
+                if failed:
+                    self.n_failed += 1
+                    if task.kind == "flush":  # Keep the edits dirty and retry later
+                        self.unflushed_edits[task.table_name] = self.unflushed_edits.get(task.table_name, 0) + 1
+                        self.submit("flush", task.table_name, self.flush_delay)
+                else:
+                    self.n_completed += 1
+                self._cond.notify_all()
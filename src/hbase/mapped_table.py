@@ -0,0 +1,128 @@
+import mmap
+from array import array
+from json.decoder import scanstring
+from typing import Iterator, Optional
+
+from hbase.serialization import decode_entry, parse_header
+from hbase.storage import CHECKSUM_PREFIX
+from hbase.table import expiry_cutoffs, live_cells, load_metadata
+from hbase.table_dataclasses import Result, RowEntry
+
+ROW_KEY_PREFIX = b'{"row_key":"'
+
+
+class MappedTable:
+    # Read-only view of a table file. The file is mapped instead of loaded, so processes reading
+    # the same data directory share the page cache. Only an array with the offset of every row
+    # line is built; rows are decoded when they are returned.
+    # Saves replace the file with os.replace, an open MappedTable keeps seeing the old snapshot.
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._file = open(file_path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty file
+            self._file.close()
+            raise Exception(f"'{file_path}' is not a valid table file")
+
+        header_end = self._map.find(b"\n")
+        header = parse_header(self._map[:header_end])
+        if header is None or not header.get("sorted"):
+            self.close()
+            raise Exception(f"'{file_path}' is not in the sorted table layout, save the table again to convert it")
+
+        self.metadata = load_metadata(header["metadata"])
+        self.policies = {cf.name: cf.policy() for cf in self.metadata.column_families}
+
+        # Row lines go from after the header up to the checksum footer
+        data_end = self._map.rfind(b"\n" + CHECKSUM_PREFIX.encode("utf-8"))
+        if data_end < header_end:
+            self.close()
+            raise Exception(f"Missing checksum footer in '{file_path}', the file is truncated")
+
+        self._offsets = array("Q")
+        pos = header_end + 1
+        while pos <= data_end:
+            self._offsets.append(pos)
+            pos = self._map.find(b"\n", pos) + 1
+        self._offsets.append(data_end + 1)  # Sentinel, end of the last row line
+
+    def __enter__(self) -> "MappedTable":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if not self._map.closed:
+            self._map.close()
+        self._file.close()
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def _line(self, i: int) -> bytes:
+        return self._map[self._offsets[i]:self._offsets[i + 1] - 1]
+
+    def _row_key(self, i: int) -> str:
+        line = self._line(i).decode("utf-8")
+        row_key, _ = scanstring(line, len(ROW_KEY_PREFIX))
+        return row_key
+
+    def _lower_bound(self, row_key: str) -> int:
+        # Index of the first row line with a row key >= row_key
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._row_key(mid) < row_key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _entries(self, start_row: Optional[str] = None, stop_row: Optional[str] = None) -> Iterator[RowEntry]:
+        start = self._lower_bound(start_row) if start_row else 0
+        for i in range(start, len(self)):
+            entry = decode_entry(self._line(i).decode("utf-8"))
+            if stop_row and entry.row_key >= stop_row:
+                return
+            yield entry
+
+    def get_row(self, row_key: str, column_family: Optional[str] = None, column_qualifier: Optional[str] = None,
+                versions: int = 1) -> Result:
+        if self.metadata.is_disabled:
+            raise Exception("Failed 1 action: NotServingRegionException: 1 time,")
+
+        result = Result(row_key)
+        qualifiers = {column_qualifier} if column_qualifier else None
+        expiry = expiry_cutoffs(self.policies)
+        for entry in self._entries(start_row=row_key):
+            if entry.row_key != row_key:
+                break
+            if not column_family or entry.column_family == column_family:
+                result.cells.extend(live_cells(entry, expiry, versions, qualifiers))
+        return result
+
+    def scan(self, start_row: Optional[str] = None, stop_row: Optional[str] = None) -> Iterator[Result]:
+        if self.metadata.is_disabled:
+            raise Exception("Failed to scan data: Table is disabled.")
+
+        result = None
+        expiry = expiry_cutoffs(self.policies)
+        for entry in self._entries(start_row, stop_row):
+            cells = live_cells(entry, expiry)
+            if not cells:
+                continue
+            if result and result.row_key != entry.row_key:
+                yield result
+                result = None
+            if not result:
+                result = Result(entry.row_key)
+            result.cells.extend(cells)
+        if result:
+            yield result
+
+    def count(self) -> int:
+        if self.metadata.is_disabled:
+            raise Exception("Failed to count rows: Table is disabled.")
+        return len(self)
@@ -0,0 +1,362 @@
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional
+
+from hbase.coprocessor import RegionObserver
+from hbase.storage import atomic_write, read_verified
+
+REPLICATION_DIR = "replication"
+EDIT_LOG_PREFIX = "edits."
+EDIT_LOG_SUFFIX = ".log"
+LEGACY_EDIT_LOG = "edits.log"  # Before logs had generations
+PEERS_FILE = "peers.json"
+
+
+@dataclass
+class ReplicationPeer:
+    id: str
+    path: str
+    enabled: bool = True
+    position: int = 0  # Offset in the edit log of the first edit not shipped yet
+    last_shipped_seq: int = 0
+    last_shipped_at: Optional[float] = None
+    last_edit_at: Optional[float] = None  # Write time of the last shipped edit
+    last_error: Optional[str] = None
+
+
+class ReplicationObserver(RegionObserver):
+    # Appends the mutations of families with REPLICATION_SCOPE => '1' to the edit log
+    def __init__(self, manager: "ReplicationManager"):
+        self.manager = manager
+
+    def _is_replicated(self, table, column_family: str) -> bool:
+        policy = table.policies.get(column_family)
+        return policy is not None and policy.replicated
+
+    def post_put(self, table, result, row_key, column_family, column_qualifier, value, timestamp=None) -> None:
+        # The row is still locked, the latest version of the cell is the one just written
+        if self.manager.peers and self._is_replicated(table, column_family):
+            timestamp = timestamp or table.cell_timestamp(row_key, column_family, column_qualifier)
+            self.manager.append(table, "put", row_key, column_family, column_qualifier, value, timestamp=timestamp)
+
+    def post_delete(self, table, result, row_key, column_family, column_qualifier) -> None:
+        if self.manager.peers and self._is_replicated(table, column_family):
+            self.manager.append(table, "delete", row_key, column_family, column_qualifier)
+
+    def post_delete_all(self, table, result, row_key) -> None:
+        if self.manager.peers:
+            families = [name for name, policy in table.policies.items() if policy.replicated]
+            if families:
+                self.manager.append(table, "delete_row", row_key, families=families)
+
+    def post_increment(self, table, result, row_key, column_family, column_qualifier, delta=1,
+                       timestamp=None) -> None:
+        # Shipped as the resulting value, applying it twice gives the same counter
+        if self.manager.peers and self._is_replicated(table, column_family):
+            timestamp = table.cell_timestamp(row_key, column_family, column_qualifier)
+            self.manager.append(table, "counter", row_key, column_family, column_qualifier, result, timestamp=timestamp)
+
+
+class ReplicationManager:
+    # Asynchronous replication to peer databases (other data directories). Edits are appended to a
+    # log in <data_dir>/replication and a background thread ships them in batches to every enabled
+    # peer. Each peer remembers its position in the log, so shipping resumes where it stopped after
+    # a restart or while a peer is disabled. Writers block while the log is too far ahead of a peer.
+    def __init__(self, hbase, batch_size: int = 500, max_lag_bytes: int = 16 * 1024 * 1024,
+                 ship_interval: float = 0.5):
+        self.hbase = hbase
+        self.batch_size = batch_size
+        self.max_lag_bytes = max_lag_bytes
+        self.ship_interval = ship_interval
+
+        self.dir = os.path.join(hbase.data_dir, REPLICATION_DIR)
+        self.generation = 0  # The log starts over in a new file once every peer shipped it
+        self.peers_path = os.path.join(self.dir, PEERS_FILE)
+
+        self.observer = ReplicationObserver(self)
+        self.peers: Dict[str, ReplicationPeer] = {}
+        self._peer_dbs: Dict[str, object] = {}
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._log = None
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+        if os.path.exists(self.peers_path):
+            state = json.loads(read_verified(self.peers_path))
+            if isinstance(state, list):  # Written before logs had generations
+                state = {"generation": 0, "peers": state}
+                legacy_log = os.path.join(self.dir, LEGACY_EDIT_LOG)
+                if os.path.exists(legacy_log):
+                    os.replace(legacy_log, self.log_path)
+            self.generation = state["generation"]
+            for peer in state["peers"]:
+                self.peers[peer["id"]] = ReplicationPeer(**peer)
+            self._remove_old_logs()
+            self._seq = max([p.last_shipped_seq for p in self.peers.values()] + [self._last_logged_seq()])
+        if self.peers:
+            self._start()
+
+    @property
+    def log_path(self) -> str:
+        return os.path.join(self.dir, f"{EDIT_LOG_PREFIX}{self.generation}{EDIT_LOG_SUFFIX}")
+
+    def _remove_old_logs(self) -> None:
+        # Logs of previous generations left by a crash during a rotation
+        for file in os.listdir(self.dir):
+            path = os.path.join(self.dir, file)
+            if file.startswith(EDIT_LOG_PREFIX) and file.endswith(EDIT_LOG_SUFFIX) and path != self.log_path:
+                os.remove(path)
+
+    def _last_logged_seq(self) -> int:
+        if not os.path.exists(self.log_path):
+            return 0
+        last = 0
+        with open(self.log_path, "rb") as f:
+            for line in f:
+                if line.endswith(b"\n"):
+                    last = json.loads(line)["seq"]
+        return last
+
+    def _log_size(self) -> int:
+        return os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+
+    def _save_peers(self) -> None:
+        os.makedirs(self.dir, exist_ok=True)
+        with atomic_write(self.peers_path) as f:
+            json.dump({"generation": self.generation, "peers": [asdict(p) for p in self.peers.values()]}, f, indent=4)
+
+    def _start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="hbase-replication", daemon=True)
+            self._thread.start()
+
+    def add_peer(self, peer_id: str, path: str) -> None:
+        if os.path.abspath(path) == os.path.abspath(self.hbase.data_dir):
+            raise Exception("A peer cannot use the same data directory as the primary")
+        with self._cond:
+            if peer_id in self.peers:
+                raise Exception(f"Peer '{peer_id}' already exists")
+            # A new peer receives the edits made from now on
+            self.peers[peer_id] = ReplicationPeer(peer_id, path, position=self._log_size(), last_shipped_seq=self._seq)
+            self._save_peers()
+        self._start()
+
+    def remove_peer(self, peer_id: str) -> None:
+        with self._cond:
+            self._get_peer(peer_id)
+            del self.peers[peer_id]
+            self._save_peers()
+            self._cond.notify_all()
+        peer_db = self._peer_dbs.pop(peer_id, None)
+        if peer_db:
+            peer_db.close()
+
+    def set_peer_enabled(self, peer_id: str, enabled: bool) -> None:
+        with self._cond:
+            peer = self._get_peer(peer_id)
+            peer.enabled = enabled
+            self._save_peers()
+            self._cond.notify_all()
+
+    def _get_peer(self, peer_id: str) -> ReplicationPeer:
+        if peer_id not in self.peers:
+            raise Exception(f"Peer '{peer_id}' not found")
+        return self.peers[peer_id]
+
+    def get_peer_db(self, peer_id: str):
+        # The peer database, reads can be served from it
+        from hbase.hbase import Hbase
+
+        peer = self._get_peer(peer_id)
+        if peer_id not in self._peer_dbs:
+            os.makedirs(peer.path, exist_ok=True)
+            self._peer_dbs[peer_id] = Hbase(peer.path)
+        return self._peer_dbs[peer_id]
+
+    def append(self, table, op: str, row_key: str, column_family: Optional[str] = None,
+               column_qualifier: Optional[str] = None, value=None, families: Optional[List[str]] = None,
+               timestamp: Optional[str] = None) -> None:
+        # ts is when the edit was logged, timestamp the one of the cell, which the peers keep
+        with self._cond:
+            # Backpressure, wait for the enabled peers to catch up
+            while not self._stopped and self._lag_bytes() >= self.max_lag_bytes:
+                self._cond.notify_all()
+                self._cond.wait(timeout=0.1)
+
+            if self._log is None:
+                os.makedirs(self.dir, exist_ok=True)
+                self._log = open(self.log_path, "ab")
+            self._seq += 1
+            edit = {"seq": self._seq, "ts": time.time(), "table": table.metadata.name, "op": op, "row": row_key}
+            if column_family is not None:
+                edit.update({"cf": column_family, "cq": column_qualifier})
+            if op in ("put", "counter"):
+                edit["value"] = value
+                edit["timestamp"] = timestamp
+            if families is not None:
+                edit["families"] = families
+            self._log.write(json.dumps(edit, ensure_ascii=False).encode("utf-8") + b"\n")
+            self._log.flush()
+            self._cond.notify_all()
+
+    def _lag_bytes(self) -> int:
+        positions = [p.position for p in self.peers.values() if p.enabled]
+        return self._log_size() - min(positions) if positions else 0
+
+    def status(self) -> List[dict]:
+        now = time.time()
+        with self._cond:
+            log_size = self._log_size()
+            return [
+                {
+                    "id": p.id,
+                    "path": p.path,
+                    "enabled": p.enabled,
+                    "lag_edits": self._seq - p.last_shipped_seq,
+                    "lag_bytes": log_size - p.position,
+                    # Delay between the write of the last shipped edit and its shipping
+                    "age_of_last_shipped": p.last_shipped_at - p.last_edit_at if p.last_edit_at else None,
+                    "seconds_since_last_ship": now - p.last_shipped_at if p.last_shipped_at else None,
+                    "last_shipped_at": p.last_shipped_at,
+                    "last_error": p.last_error,
+                }
+                for p in self.peers.values()
+            ]
+
+    def wait_caught_up(self, timeout: Optional[float] = None) -> bool:
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._cond:
+            self._cond.notify_all()
+            while any(p.enabled and p.last_shipped_seq < self._seq for p in self.peers.values()):
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(timeout=min(remaining, 0.1) if remaining is not None else 0.1)
+        return True
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join()
+        if self._log:
+            self._log.close()
+            self._log = None
+        for peer_db in self._peer_dbs.values():
+            peer_db.close()
+        self._peer_dbs.clear()
+
+    def _read_batch(self, peer: ReplicationPeer) -> tuple[list, int]:
+        edits = []
+        position = peer.position
+        if not os.path.exists(self.log_path):
+            return edits, position
+        with open(self.log_path, "rb") as f:
+            f.seek(position)
+            for line in f:
+                if not line.endswith(b"\n"):  # Edit still being written
+                    break
+                edits.append(json.loads(line))
+                position += len(line)
+                if len(edits) >= self.batch_size:
+                    break
+        return edits, position
+
+    def _ship(self, peer: ReplicationPeer) -> bool:
+        # Returns True if edits were shipped
+        edits, position = self._read_batch(peer)
+        if not edits:
+            return False
+
+        peer_db = self.get_peer_db(peer.id)
+        for edit in edits:
+            self._apply(peer_db, edit)
+        peer_db.flush_all()  # The position only moves once the peer has persisted the batch
+
+        with self._cond:
+            peer.position = position
+            peer.last_shipped_seq = edits[-1]["seq"]
+            peer.last_shipped_at = time.time()
+            peer.last_edit_at = edits[-1]["ts"]
+            peer.last_error = None
+            self._save_peers()
+            self._truncate_log()
+            self._cond.notify_all()
+        return True
+
+    def _truncate_log(self) -> None:
+        # Once every peer shipped everything the log starts over in a new generation. Must hold the
+        # condition. The reset positions are saved with the new generation before the old log is
+        # removed, so a crash in between never pairs stale positions with a fresh log.
+        if self.peers and all(p.position >= self._log_size() for p in self.peers.values()):
+            if self._log:
+                self._log.close()
+                self._log = None
+            old_log_path = self.log_path
+            self.generation += 1
+            for p in self.peers.values():
+                p.position = 0
+            self._save_peers()
+            if os.path.exists(old_log_path):
+                os.remove(old_log_path)
+
+    def _ensure_table(self, peer_db, table_name: str, column_family: str) -> None:
+        # Creates the table and family on the peer with the settings they have on the primary
+        if not peer_db._find_table(table_name):
+            peer_db.create_table(table_name, [])
+        if peer_db.get_table(table_name).get_column_family(column_family):
+            return
+
+        source = self.hbase._find_table(table_name)
+        cf = source.get_column_family(column_family) if source else None
+        properties = cf.to_dict() if cf else {}
+        properties["name"] = column_family
+        peer_db.alter_table(table_name, properties)
+
+    def _apply(self, peer_db, edit: dict) -> None:
+        table_name = edit["table"]
+        if edit["op"] == "put":
+            self._ensure_table(peer_db, table_name, edit["cf"])
+            peer_db.put(table_name, edit["row"], edit["cf"], edit["cq"], edit["value"], edit.get("timestamp"))
+        elif edit["op"] == "counter":
+            self._ensure_table(peer_db, table_name, edit["cf"])
+            current = peer_db.get_counter(table_name, edit["row"], edit["cf"], edit["cq"]) or 0
+            peer_db.increment(table_name, edit["row"], edit["cf"], edit["cq"], edit["value"] - current,
+                              edit.get("timestamp"))
+        elif edit["op"] == "delete":
+            try:
+                peer_db.delete(table_name, edit["row"], edit["cf"], edit["cq"])
+            except Exception:  # Already gone on the peer
+                pass
+        elif edit["op"] == "delete_row":
+            if not peer_db._find_table(table_name):
+                return
+            result = peer_db.get_row(table_name, edit["row"])
+            for cell in result.cells:
+                if cell.column_family in edit["families"]:
+                    peer_db.delete(table_name, edit["row"], cell.column_family, cell.column_qualifier)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                peers = [p for p in self.peers.values() if p.enabled]
+
+            shipped = False
+            for peer in peers:
+                try:
+                    shipped = self._ship(peer) or shipped
+                except Exception as e:
+                    with self._cond:
+                        peer.last_error = str(e)
+
+            if not shipped:
+                with self._cond:
+                    if not self._stopped:
+                        self._cond.wait(timeout=self.ship_interval)
@@ -0,0 +1,100 @@
+import hashlib
+import json
+from typing import Iterable, Iterator, Optional
+
+from hbase.storage import CHECKSUM_PREFIX, read_verified
+from hbase.table_dataclasses import RowEntry
+
+# Table files are JSON Lines: a header line with the metadata, one line per row entry and the
+# checksum footer. Rows are streamed to and from the file, so the whole table is never held as
+# one big string or nested dict. Every row line starts with its row key: {"row_key":"...",...
+FORMAT_NAME = "hbase-jsonl"
+FORMAT_VERSION = 1
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+_decoder = json.JSONDecoder()
+
+
+def encode_entry(entry: RowEntry) -> str:
+    return _encoder.encode({
+        "row_key": entry.row_key,
+        "column_family": entry.column_family,
+        "column_qualifiers": entry.column_qualifiers,
+    })
+
+
+def decode_entry(line: str) -> RowEntry:
+    return RowEntry(**_decoder.decode(line))
+
+
+def write_table(f, metadata: dict, lines: Iterable[str]) -> None:
+    # lines are the encoded entries, sorted by (row_key, column_family), MappedTable binary searches the file
+    f.write(_encoder.encode({"format": FORMAT_NAME, "version": FORMAT_VERSION, "sorted": True, "metadata": metadata}))
+    f.write("\n")
+    for line in lines:
+        f.write(line)
+        f.write("\n")
+
+
+def parse_header(line: bytes) -> Optional[dict]:
+    # Returns None when the line is not the header of a JSON Lines table file
+    try:
+        header = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(header, dict) or header.get("format") != FORMAT_NAME:
+        return None
+    return header
+
+
+class TableReader:
+    def __init__(self, path: str):
+        self.path = path
+        self.metadata: dict = {}
+        self._file = None
+        self._legacy_data: Optional[dict] = None
+
+    def __enter__(self) -> "TableReader":
+        self._file = open(self.path, "rb")
+        header = parse_header(self._file.readline())
+
+        if header is None:
+            # Compatibility with the previous format, a single indented JSON document
+            self._file.close()
+            self._file = None
+            data = json.loads(read_verified(self.path))
+            self.metadata = data["metadata"]
+            self._legacy_data = data["data"]
+            return self
+
+        if header["version"] > FORMAT_VERSION:
+            raise Exception(f"Unsupported table file version {header['version']} in '{self.path}'")
+        self.metadata = header["metadata"]
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def entries(self) -> Iterator[RowEntry]:
+        if self._legacy_data is not None:
+            for row_key, column_families in self._legacy_data.items():
+                for column_family, column_qualifiers in column_families.items():
+                    yield RowEntry(row_key=row_key, column_family=column_family, column_qualifiers=column_qualifiers)
+            return
+
+        checksum = hashlib.sha256()
+        self._file.seek(0)
+        checksum.update(self._file.readline())
+
+        footer = CHECKSUM_PREFIX.encode("utf-8")
+        for line in self._file:
+            if line.startswith(footer):
+                if checksum.hexdigest() != line[len(footer):].strip().decode("utf-8"):
+                    raise Exception(f"Checksum mismatch in '{self.path}', the file is corrupted")
+                return
+            checksum.update(line)
+            yield decode_entry(line.decode("utf-8"))
+
+        raise Exception(f"Missing checksum footer in '{self.path}', the file is truncated")
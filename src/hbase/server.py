@@ -0,0 +1,142 @@
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Optional
+
+from hbase.hbase import Hbase
+from hbase.table_dataclasses import Cell, Result
+
+DEFAULT_PORT = 9090
+MAX_LINE_SIZE = 64 * 1024 * 1024  # A scan page or get_rows response is a single line
+
+# Hbase methods that can be called by the clients
+METHODS = frozenset({
+    "list_tables", "create_table", "is_table_enabled", "is_table_disabled", "flush_all",
+    "get_row", "get_rows", "scan", "count", "get_counter", "aggregate",
+    "put", "delete", "delete_all", "increment", "check_and_put", "check_and_delete",
+})
+
+
+def encode_value(value: Any) -> Any:
+    # Results travel as {"row_key": ..., "cells": [[family, qualifier, timestamp, value], ...]}
+    if isinstance(value, Result):
+        return {
+            "row_key": value.row_key,
+            "cells": [[c.column_family, c.column_qualifier, c.timestamp, c.value] for c in value.cells],
+        }
+    if isinstance(value, list):
+        return [encode_value(v) for v in value]
+    return value
+
+
+def decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "row_key" in value and "cells" in value:
+        return Result(value["row_key"], [Cell(*cell) for cell in value["cells"]])
+    if isinstance(value, list):
+        return [decode_value(v) for v in value]
+    return value
+
+
+class HbaseServer:
+    # Serves an Hbase over TCP, one JSON document per line. Requests are
+    # {"id": ..., "method": ..., "args": [...], "kwargs": {...}} and responses {"id": ..., "result": ...}
+    # or {"id": ..., "error": ...}. Every request goes to the thread pool as soon as it is read and
+    # its response is written once it is done, so clients can pipeline requests over one connection
+    # and get the responses out of order.
+    def __init__(self, hbase: Hbase, host: str = "127.0.0.1", port: int = DEFAULT_PORT, max_workers: int = 8):
+        self.hbase = hbase
+        self.host = host
+        self.port = port
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hbase-server")
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, limit=MAX_LINE_SIZE)
+        self.port = self._server.sockets[0].getsockname()[1]  # The actual port when started with 0
+
+    async def serve_forever(self) -> None:
+        await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        self._executor.shutdown(wait=True)
+
+    def _execute(self, request_id, method: str, args: list, kwargs: dict) -> bytes:
+        # Runs in the thread pool, the response is also encoded there
+        try:
+            if method not in METHODS:
+                raise Exception(f"Unknown method '{method}'")
+            response = {"id": request_id, "result": encode_value(getattr(self.hbase, method)(*args, **kwargs))}
+        except Exception as e:
+            response = {"id": request_id, "error": str(e)}
+        return json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n"
+
+    async def _respond(self, line: bytes, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = json.loads(line)
+            call = partial(self._execute, request["id"], request["method"],
+                           request.get("args", []), request.get("kwargs", {}))
+        except (ValueError, KeyError, TypeError) as e:
+            call = None
+            response = json.dumps({"id": None, "error": f"Invalid request: {e}"}).encode("utf-8") + b"\n"
+
+        if call:
+            response = await asyncio.get_running_loop().run_in_executor(self._executor, call)
+        try:
+            if not writer.is_closing():
+                writer.write(response)
+                await writer.drain()
+        except ConnectionError:  # The client left without waiting for the response
+            pass
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                task = asyncio.create_task(self._respond(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (ConnectionError, ValueError):  # Client gone or request over MAX_LINE_SIZE
+            pass
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+
+
+async def serve(data_dir: str, host: str = "127.0.0.1", port: int = DEFAULT_PORT, max_workers: int = 8) -> None:
+    loop = asyncio.get_running_loop()
+    hbase = await loop.run_in_executor(None, Hbase, data_dir)
+    server = HbaseServer(hbase, host, port, max_workers)
+    await server.start()
+    print(f"Serving '{data_dir}' on {host}:{server.port}")
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+        await loop.run_in_executor(None, hbase.close)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serves an HBase Simulator data directory over TCP")
+    parser.add_argument("--data-dir", default="hbase/data")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.data_dir, args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
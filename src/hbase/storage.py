@@ -0,0 +1,131 @@
+import hashlib
+import os
+import stat
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, List
+
+CHECKSUM_PREFIX = "#checksum sha256:"
+TEMP_SUFFIX = ".tmp"
+QUARANTINE_DIR = "quarantine"
+
+WRITE_BUFFER_SIZE = 64 * 1024
+
+# Read once, os.umask can only be read by setting it, which is not safe once threads are running
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+class ChecksumWriter:
+    # Text file-like object that hashes everything written through it. Small writes (json.dump
+    # emits many of them) are batched so the file and the hash are only touched every ~64 KiB.
+    def __init__(self, f):
+        self._file = f
+        self._hash = hashlib.sha256()
+        self._buffer: List[str] = []
+        self._buffered = 0
+        self._ends_with_newline = True
+
+    def write(self, text: str) -> int:
+        if not text:
+            return 0
+        self._buffer.append(text)
+        self._ends_with_newline = text.endswith("\n")
+        self._buffered += len(text)
+        if self._buffered >= WRITE_BUFFER_SIZE:
+            self.flush()
+        return len(text)
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        chunk = "".join(self._buffer).encode("utf-8")
+        self._hash.update(chunk)
+        self._file.write(chunk)
+        self._buffer = []
+        self._buffered = 0
+
+    def write_footer(self) -> None:
+        # The footer always goes on its own line, the newline before it is part of the checksum
+        if not self._ends_with_newline:
+            self.write("\n")
+        self.flush()
+        self._file.write(f"{CHECKSUM_PREFIX}{self._hash.hexdigest()}\n".encode("utf-8"))
+
+
+def fsync_dir(directory: str) -> None:
+    # Persist the rename itself. Not every platform allows opening a directory.
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def file_mode(path: str) -> int:
+    # Permissions for the new version of path: those of the current file, or the default ones
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+@contextmanager
+def atomic_write(path: str) -> Iterator[ChecksumWriter]:
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=TEMP_SUFFIX, dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            writer = ChecksumWriter(f)
+            yield writer
+            writer.write_footer()
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file readable by its owner only
+        os.chmod(tmp_path, file_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    fsync_dir(directory)
+
+
+def split_checksum(content: bytes) -> tuple[bytes, str | None]:
+    # Returns the body and the stored checksum (None for files written before checksums existed)
+    stripped = content.rstrip(b"\n")
+    start = stripped.rfind(b"\n") + 1
+    last_line = stripped[start:].decode("utf-8", errors="replace")
+    if not last_line.startswith(CHECKSUM_PREFIX):
+        return content, None
+    return content[:start], last_line[len(CHECKSUM_PREFIX):]
+
+
+def read_verified(path: str) -> str:
+    with open(path, "rb") as f:
+        content = f.read()
+
+    body, checksum = split_checksum(content)
+    if checksum is not None and hashlib.sha256(body).hexdigest() != checksum:
+        raise Exception(f"Checksum mismatch in '{path}', the file is corrupted")
+
+    return body.decode("utf-8")
+
+
+def quarantine(path: str) -> str:
+    # Moves a corrupted file out of the way so it is not loaded again but can still be inspected
+    quarantine_dir = os.path.join(os.path.dirname(path), QUARANTINE_DIR)
+    os.makedirs(quarantine_dir, exist_ok=True)
+    new_path = os.path.join(
+        quarantine_dir,
+        f"{os.path.basename(path)}.{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+    )
+    os.replace(path, new_path)
+    return new_path
@@ -1,12 +1,21 @@
 import bisect
+import dataclasses
+import itertools
 import json
+import operator
 import os
+import re
+import threading
 import uuid
-from datetime import datetime
-from typing import List, Union, Optional, Dict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Collection, List, Union, Optional, Dict
 
-from hbase.table_dataclasses import MetaData, RowEntry, ColumnFamily
-from hbase.table_decorators import update_timestamp
+from hbase.serialization import TableReader, encode_entry, write_table
+from hbase.storage import atomic_write
+from hbase.table_dataclasses import MetaData, RowEntry, ColumnFamily, Condition, Mutation, Result, FamilyPolicy, Cell
+from hbase.coprocessor import RegionObserver
+from hbase.table_decorators import update_timestamp, row_locked, synchronized, observed
 
 
 def parse_data_to_dict(data: List[RowEntry]) -> dict:
@@ -18,18 +27,189 @@ def parse_data_to_dict(data: List[RowEntry]) -> dict:
     return new_dict
 
 
-def load_data(data: dict) -> List[RowEntry]:
-    new_data = []
-    for row_key, column_families in data.items():
-        for column_family, column_qualifiers in column_families.items():
-            new_data.append(
-                RowEntry(
-                    row_key=row_key,
-                    column_family=column_family,
-                    column_qualifiers=column_qualifiers
-                )
-            )
-    return new_data
+def metadata_to_dict(metadata: MetaData) -> dict:
+    metadata_dict = metadata.__dict__.copy()
+    metadata_dict["column_families"] = [cf.to_dict() for cf in metadata.column_families]
+    metadata_dict["created_at"] = metadata.created_at.isoformat()
+    metadata_dict["updated_at"] = metadata.updated_at.isoformat()
+    return metadata_dict
+
+
+def load_column_family(table_name: str, properties: dict) -> ColumnFamily:
+    # Unlike create and alter, loading accepts settings written by other versions: an invalid or
+    # unknown one is replaced by its default with a warning instead of failing the whole table.
+    cf = ColumnFamily(name=properties["name"])
+    for key in properties.keys() - COLUMN_FAMILY_KEYS:
+        print(f"Warning: ignoring unknown setting '{key}' of column family '{cf.name}' in table '{table_name}'")
+    for key in ColumnFamily.get_valid_keys():  # In field order, VERSIONS is set before MIN_VERSIONS
+        if key == "name" or key not in properties:
+            continue
+        try:
+            cf = dataclasses.replace(cf, **{key: properties[key]})
+        except Exception as e:
+            print(f"Warning: column family '{cf.name}' of table '{table_name}': {e}. "
+                  f"Using the default '{cf.to_dict()[key]}'")
+    return cf
+
+
+def load_metadata(metadata: dict) -> MetaData:
+    return MetaData(
+        name=metadata["name"],
+        column_families=[load_column_family(metadata["name"], cf) for cf in metadata["column_families"]],
+        id=metadata["id"],
+        is_disabled=metadata["is_disabled"],
+        created_at=datetime.fromisoformat(metadata["created_at"]),
+        updated_at=datetime.fromisoformat(metadata["updated_at"]),
+        n_rows=metadata["n_rows"],
+    )
+
+
+COUNTER_MIN = -2 ** 63
+COUNTER_MAX = 2 ** 63 - 1
+
+
+def check_counter(value: int) -> int:
+    # Counters are 8-byte signed longs, like in HBase
+    if not COUNTER_MIN <= value <= COUNTER_MAX:
+        raise Exception(f"Counter overflow: {value} does not fit in 8 bytes")
+    return value
+
+
+def get_counter_value(value) -> int:
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise Exception(f"Field is not a counter: '{value}'")
+    return value
+
+
+COMPARE_OPERATORS = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+NUMBER_PATTERN = re.compile(r"[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?")
+
+
+def is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def parse_number(value) -> Optional[Union[int, float]]:
+    # Plain decimal notation only, no 'nan', 'inf' or '1_0'
+    if is_number(value):
+        return value
+    if not isinstance(value, str) or not NUMBER_PATTERN.fullmatch(value):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+def compare_values(current, op: str, expected, numeric: bool = False) -> bool:
+    if op not in COMPARE_OPERATORS:
+        raise Exception(f"Invalid compare operator '{op}'")
+
+    # None means the cell does not exist
+    if expected is None or current is None:
+        return COMPARE_OPERATORS[op](current, expected) if op in ("=", "!=") else False
+
+    if numeric:  # Asked for by the caller, a value that is not a number never matches
+        current, expected = parse_number(current), parse_number(expected)
+        if current is None or expected is None:
+            return False
+    elif is_number(current) != is_number(expected):
+        # A counter checked against a value typed in the shell. The text is converted only if it is
+        # exactly how the counter would be written, '05' or '5.0' are not equal to 5.
+        text = expected if is_number(current) else current
+        if isinstance(text, str) and re.fullmatch(r"-?(0|[1-9]\d*)", text):
+            current, expected = (current, int(text)) if is_number(current) else (int(text), expected)
+        else:
+            current, expected = str(current), str(expected)
+    elif not is_number(current) and type(current) is not type(expected):
+        current, expected = str(current), str(expected)
+
+    # Both numbers or both strings: compared as they are, numbers by value and strings by their text
+    return COMPARE_OPERATORS[op](current, expected)
+
+
+def prune_versions(cell: dict, keep: int) -> int:
+    # Keeps the newest versions of a cell, renumbered from version1
+    n_versions = cell["n_versions"]
+    if n_versions <= keep:
+        return 0
+
+    kept = [cell[f"version{i}"] for i in range(n_versions - keep + 1, n_versions + 1)]
+    cell.clear()
+    cell["n_versions"] = keep
+    for i, version in enumerate(kept, start=1):
+        cell[f"version{i}"] = version
+    return n_versions - keep
+
+
+def add_version(cell: dict, timestamp: str, value) -> None:
+    # Inserts a version with a given timestamp, keeping the versions numbered in timestamp order. A
+    # version with the same timestamp is replaced, like in HBase, so a replayed edit is applied once.
+    versions = [cell[f"version{i}"] for i in range(1, cell["n_versions"] + 1)]
+    i = bisect.bisect_left(versions, timestamp, key=lambda version: version["timestamp"])
+    if i < len(versions) and versions[i]["timestamp"] == timestamp:
+        versions[i] = {"timestamp": timestamp, "value": value}
+    else:
+        versions.insert(i, {"timestamp": timestamp, "value": value})
+    cell.clear()
+    cell["n_versions"] = len(versions)
+    for i, version in enumerate(versions, start=1):
+        cell[f"version{i}"] = version
+
+
+def expire_versions(cell: dict, cutoff: str, min_versions: int = 0) -> int:
+    # Drops the versions older than the cutoff, except for the newest min_versions. Versions are
+    # numbered in timestamp order, so the expired ones are the first.
+    n_versions = cell["n_versions"]
+    expired = 0
+    while expired < n_versions - min_versions and cell[f"version{expired + 1}"]["timestamp"] < cutoff:
+        expired += 1
+    if expired:
+        prune_versions(cell, n_versions - expired)
+    return expired
+
+
+def expiry_cutoffs(policies: Dict[str, FamilyPolicy]) -> Dict[str, tuple[str, int]]:
+    # family -> (cutoff, min_versions) for the families with a TTL. Timestamps are ISO strings,
+    # so a version expired if its timestamp sorts before the cutoff.
+    now = datetime.now()
+    return {
+        name: ((now - timedelta(seconds=policy.ttl)).isoformat(), policy.min_versions)
+        for name, policy in policies.items() if policy.ttl is not None
+    }
+
+
+def live_cells(entry: RowEntry, expiry: Dict[str, tuple[str, int]], versions: Optional[int] = None,
+               qualifiers: Optional[Collection[str]] = None) -> List[Cell]:
+    cutoff, min_versions = expiry.get(entry.column_family, (None, 0))
+    if cutoff is None:
+        return entry.cells(versions, qualifiers)
+    if not min_versions and entry.latest_timestamp() < cutoff:
+        return []  # Everything in the entry expired, the cells are not even looked at
+    return entry.cells(versions, qualifiers, cutoff, min_versions)
+
+
+# Entries encoded per table lock acquisition while saving
+SAVE_CHUNK_SIZE = 1000
+
+COLUMN_FAMILY_KEYS = frozenset(ColumnFamily.get_valid_keys())
+
+
+def entry_row_key(entry: RowEntry) -> str:
+    return entry.row_key
+
+
+def entry_sort_key(entry: RowEntry) -> tuple[str, str]:
+    return entry.row_key, entry.column_family
 
 
 class Table:
@@ -45,34 +225,103 @@ class Table:
         )
         self.data: List[RowEntry] = []
 
+        # Column families by name and their precomputed policies, rebuilt on every schema change
+        self._families: Dict[str, ColumnFamily] = {}
+        self.policies: Dict[str, FamilyPolicy] = {}
+        self._index_families()
+
+        self.observers: List[RegionObserver] = []
+
+        self.lock = threading.RLock()  # Always taken after the row locks
+        self.save_lock = threading.RLock()  # One save at a time, taken before the table lock
+        self._row_locks: Dict[str, list] = {}  # row_key -> [lock, n_holders]
+        self._row_locks_guard = threading.Lock()
+
+    @contextmanager
+    def row_lock(self, *row_keys: str):
+        # Locks are acquired in key order so multi-row operations cannot deadlock each other
+        row_keys = sorted(set(row_keys))
+        with self._row_locks_guard:
+            locks = []
+            for row_key in row_keys:
+                lock = self._row_locks.setdefault(row_key, [threading.RLock(), 0])
+                lock[1] += 1
+                locks.append(lock[0])
+
+        try:
+            for lock in locks:
+                lock.acquire()
+            try:
+                yield
+            finally:
+                for lock in reversed(locks):
+                    lock.release()
+        finally:
+            with self._row_locks_guard:
+                for row_key in row_keys:
+                    lock = self._row_locks[row_key]
+                    lock[1] -= 1
+                    if not lock[1]:
+                        del self._row_locks[row_key]
+
+    def register_observer(self, observer: RegionObserver) -> None:
+        self.observers.append(observer)
+
+    def unregister_observer(self, observer: RegionObserver) -> None:
+        self.observers.remove(observer)
+
     def load(self, file_path: str) -> None:
-        with open(file_path, "r") as f:
-            data = json.load(f)
-        
-        self.metadata = MetaData(
-            name=data["metadata"]["name"],
-            column_families=[ColumnFamily(**cf) for cf in data["metadata"]["column_families"]],
-            id=data["metadata"]["id"],
-            is_disabled=data["metadata"]["is_disabled"],
-            created_at=datetime.fromisoformat(data["metadata"]["created_at"]),
-            updated_at=datetime.fromisoformat(data["metadata"]["updated_at"]),
-            n_rows=data["metadata"]["n_rows"],
-        )
-        self.data = load_data(data["data"])
+        # Rows are read one line at a time, the file is never loaded as a whole
+        with TableReader(file_path) as reader:
+            metadata = load_metadata(reader.metadata)
+            data = []
+            is_sorted = True
+            for entry in reader.entries():
+                if data and entry_sort_key(entry) < entry_sort_key(data[-1]):
+                    is_sorted = False
+                data.append(entry)
+
+        # Files written by older versions are not always sorted
+        if not is_sorted:
+            data.sort(key=entry_sort_key)
+
+        self.metadata = metadata
+        self.data = data
+        self._index_families()
 
     def to_json(self) -> str:
-        metadata_dict = self.metadata.__dict__.copy()
-        metadata_dict["column_families"] = [cf.__dict__ for cf in metadata_dict["column_families"]]
-        metadata_dict["created_at"] = self.metadata.created_at.isoformat()
-        metadata_dict["updated_at"] = self.metadata.updated_at.isoformat()
-        json_str = {"metadata": metadata_dict, "data": parse_data_to_dict(self.data)}
+        # Single document export in the previous file format
+        json_str = {"metadata": metadata_to_dict(self.metadata), "data": parse_data_to_dict(self.data)}
         return json.dumps(json_str, indent=4)
 
+    def snapshot(self) -> tuple[dict, List[str]]:
+        # Encodes the entries SAVE_CHUNK_SIZE at a time, writers get the table lock between chunks.
+        # The next chunk starts after the last key encoded, so the lines stay sorted and unique. A
+        # write landing behind that key is left out, it marks the table dirty for the next flush.
+        lines = []
+        last_key = None
+        while True:
+            with self.lock:
+                i = bisect.bisect_right(self.data, last_key, key=entry_sort_key) if last_key else 0
+                chunk = self.data[i:i + SAVE_CHUNK_SIZE]
+                lines.extend(encode_entry(entry) for entry in chunk)
+                if len(chunk) < SAVE_CHUNK_SIZE:
+                    metadata = metadata_to_dict(self.metadata)
+                    break
+                last_key = entry_sort_key(chunk[-1])
+
+        metadata["n_rows"] = len(lines)
+        return metadata, lines
+
     def save(self, save_dir: str) -> None:
-        os.makedirs(save_dir, exist_ok=True)
-        path = os.path.join(save_dir, f"{self.metadata.name}.json")
-        with open(path, "w") as f:
-            f.write(self.to_json())
+        # Only the encoding holds the table lock, the file is written and synced outside of it
+        with self.save_lock:
+            metadata, lines = self.snapshot()
+            os.makedirs(save_dir, exist_ok=True)
+            path = os.path.join(save_dir, f"{self.metadata.name}.json")
+            # Written to a temporary file and swapped in, a crash mid-save never leaves a truncated table
+            with atomic_write(path) as f:
+                write_table(f, metadata, lines)
 
     @update_timestamp
     def enable(self) -> None:
@@ -82,94 +331,140 @@ class Table:
     def disable(self) -> None:
         self.metadata.is_disabled = True
 
-    def get_column_family(self, column_family_name: str) -> Optional[ColumnFamily]:
-        for cf in self.metadata.column_families:
-            if cf.name == column_family_name:
-                return cf
+    @update_timestamp
+    @synchronized
+    def truncate(self, preserve: bool = True) -> List[RowEntry]:
+        # Swaps in empty storage and returns the old rows, so freeing them can be left to the caller.
+        # The schema and column family settings are kept, without preserve the table gets a new identity.
+        old_data = self.data
+        self.data = []
+        self.metadata.n_rows = 0
+        if not preserve:
+            self.metadata.id = str(uuid.uuid4())
+            self.metadata.created_at = datetime.now()
+        return old_data
+
+    def _entry_position(self, row_key: str, column_family: Optional[str] = None) -> int:
+        # self.data is kept sorted by (row_key, column_family), the on-disk layout relies on it
+        if column_family is None:
+            return bisect.bisect_left(self.data, row_key, key=entry_row_key)
+        return bisect.bisect_left(self.data, (row_key, column_family), key=entry_sort_key)
+
+    def _get_entry(self, row_key: str, column_family: str) -> Optional[RowEntry]:
+        i = self._entry_position(row_key, column_family)
+        if i < len(self.data) and self.data[i].row_key == row_key and self.data[i].column_family == column_family:
+            return self.data[i]
         return None
 
+    def _index_families(self) -> None:
+        # New dicts are swapped in, readers never see a half-built index
+        self._families = {cf.name: cf for cf in self.metadata.column_families}
+        self.policies = {cf.name: cf.policy() for cf in self.metadata.column_families}
+
+    def _expiry(self) -> Dict[str, tuple[str, int]]:
+        return expiry_cutoffs(self.policies)
+
+    @staticmethod
+    def _is_expired(column_family: str, timestamp: str, expiry: Dict[str, tuple[str, int]]) -> bool:
+        # For the newest version of a cell
+        cutoff, min_versions = expiry.get(column_family, (None, 0))
+        return cutoff is not None and not min_versions and timestamp < cutoff
+
+    def get_column_family(self, column_family_name: str) -> Optional[ColumnFamily]:
+        return self._families.get(column_family_name)
+
     @update_timestamp
+    @synchronized
     def create_column_family(self, column_family_name: str, properties: Optional[dict] = None) -> None:
         if self.metadata.is_disabled:
             raise Exception("Failed to create column family: Table is disabled.")
-        if self.get_column_family(column_family_name):
+        if column_family_name in self._families:
             raise Exception(f"Column family '{column_family_name}' already exists")
 
         properties = properties or {}
+        for key in properties:
+            if key not in COLUMN_FAMILY_KEYS or key == 'name':
+                raise Exception(f"Invalid property '{key}' for a column family")
         self.metadata.column_families.append(ColumnFamily(name=column_family_name, **properties))
+        self._index_families()
 
     @update_timestamp
+    @synchronized
     def update_column_family(self, column_family_name: str, properties: dict) -> None:
         if self.metadata.is_disabled:
             raise Exception("Failed to update column family: Table is disabled.")
-        
-        cf = self.get_column_family(column_family_name)
+
+        cf = self._families.get(column_family_name)
         if not cf:
             raise Exception(f"Column family '{column_family_name}' not found")
 
-        valid_keys = ColumnFamily.get_valid_keys()
-        for key, value in properties.items():
-            if key not in valid_keys:
+        for key in properties:
+            if key not in COLUMN_FAMILY_KEYS or key == 'name':
                 raise Exception(f"Invalid property '{key}' for a column family")
-            setattr(cf, key, value)
+
+        # Validated as a whole, an invalid value leaves the family unchanged
+        new_cf = dataclasses.replace(cf, **properties)
+        i = self.metadata.column_families.index(cf)
+        self.metadata.column_families[i] = new_cf
+        self._index_families()
 
     @update_timestamp
+    @synchronized
     def delete_column_family(self, column_family_name: str) -> None:
-        cf = self.get_column_family(column_family_name)
+        cf = self._families.get(column_family_name)
         if not cf:
             raise Exception(f"Column family '{column_family_name}' not found")
 
         self.metadata.column_families.remove(cf)
+        self._index_families()
 
     @update_timestamp
-    def put(self, row_key: str, column_family: str, column_qualifier: str, value: str) -> None:
+    @row_locked
+    @observed
+    @synchronized
+    def put(self, row_key: str, column_family: str, column_qualifier: str, value: str,
+            timestamp: Optional[str] = None) -> None:
         if self.metadata.is_disabled:
             raise Exception("Failed to put data: Table is disabled.")
 
-        if not self.get_column_family(column_family):
+        if column_family not in self.policies:
             raise Exception(f"Column family '{column_family}' not found")
 
+        self._put_cell(row_key, column_family, column_qualifier, value, timestamp)
+
+    def _put_cell(self, row_key: str, column_family: str, column_qualifier: str, value,
+                  timestamp: Optional[str] = None) -> None:
+        # Adds a version to the cell, stamped now unless a timestamp is given (replicated edits keep
+        # the one of the source). The caller checks the table and holds the locks.
+        given = timestamp is not None
+        timestamp = timestamp or datetime.now().isoformat()
+        i = self._entry_position(row_key, column_family)
+
         # Si el row_key y column_family ya existen, actualiza la entrada
-        for entry in self.data:
-            if entry.row_key == row_key:
-                if entry.column_family == column_family:
-                    if column_qualifier in entry.column_qualifiers:
-                        entry.column_qualifiers[column_qualifier]["n_versions"] += 1
-                        entry.column_qualifiers[column_qualifier][
-                            f"version{entry.column_qualifiers[column_qualifier]['n_versions']}"
-                        ] = {
-                            "timestamp": datetime.now().isoformat(),
-                            "value": value
-                        }
-                    else:
-                        entry.column_qualifiers[column_qualifier] = {
-                            "n_versions": 1,
-                            "version1": {
-                                "timestamp": datetime.now().isoformat(),
-                                "value": value
-                            }
-                        }
-                    return
-                # Si el row_key existe pero con otra column_family, agregar nueva entrada
-                elif column_family not in [e.column_family for e in self.data if e.row_key == row_key]:
-                    new_entry = RowEntry(
-                        row_key=row_key,
-                        column_family=column_family,
-                        column_qualifiers={
-                            column_qualifier: {
-                                "n_versions": 1,
-                                "version1": {
-                                    "timestamp": datetime.now().isoformat(),
-                                    "value": value
-                                }
-                            }
-                        }
-                    )
-                    self.data.append(new_entry)
-                    self.metadata.n_rows += 1
-                    return
+        if i < len(self.data) and self.data[i].row_key == row_key and self.data[i].column_family == column_family:
+            entry = self.data[i]
+            if given and column_qualifier in entry.column_qualifiers:
+                add_version(entry.column_qualifiers[column_qualifier], timestamp, value)
+            elif column_qualifier in entry.column_qualifiers:
+                entry.column_qualifiers[column_qualifier]["n_versions"] += 1
+                entry.column_qualifiers[column_qualifier][
+                    f"version{entry.column_qualifiers[column_qualifier]['n_versions']}"
+                ] = {
+                    "timestamp": timestamp,
+                    "value": value
+                }
+            else:
+                entry.column_qualifiers[column_qualifier] = {
+                    "n_versions": 1,
+                    "version1": {
+                        "timestamp": timestamp,
+                        "value": value
+                    }
+                }
+            entry.touch(timestamp)
+            return
 
-        # Si el row_key no existe, crea una nueva entrada
+        # Si no existe, crea una nueva entrada en su posición ordenada
         new_entry = RowEntry(
             row_key=row_key,
             column_family=column_family,
@@ -177,21 +472,23 @@ class Table:
                 column_qualifier: {
                     "n_versions": 1,
                     "version1": {
-                        "timestamp": datetime.now().isoformat(),
+                        "timestamp": timestamp,
                         "value": value
                     }
                 }
             }
         )
-        i = bisect.bisect_left([e.row_key for e in self.data], new_entry.row_key)
         self.data.insert(i, new_entry)
         self.metadata.n_rows += 1
 
     @update_timestamp
+    @row_locked
+    @observed
+    @synchronized
     def delete(self, row_key: str, column_family: str, column_qualifier: str) -> None:
         if self.metadata.is_disabled:
             raise Exception("Failed to delete data: Table is disabled.")
-        if not self.get_column_family(column_family):
+        if column_family not in self.policies:
             raise Exception(f"Column family '{column_family}' not found")
 
         for entry in self.data:
@@ -207,6 +504,9 @@ class Table:
         raise Exception(f"Row key '{row_key}' not found")
 
     @update_timestamp
+    @row_locked
+    @observed
+    @synchronized
     def delete_all(self, row_key: str) -> int:
         if self.metadata.is_disabled:
             raise Exception("Failed to delete all data: Table is disabled.")
@@ -219,18 +519,239 @@ class Table:
 
         return len(entries_to_delete)
 
-    def scan(self) -> str:
+    @update_timestamp
+    @row_locked
+    @observed
+    @synchronized
+    def increment(self, row_key: str, column_family: str, column_qualifier: str, delta: int = 1,
+                  timestamp: Optional[str] = None) -> int:
+        if self.metadata.is_disabled:
+            raise Exception("Failed to increment counter: Table is disabled.")
+        if column_family not in self.policies:
+            raise Exception(f"Column family '{column_family}' not found")
+
+        entry = self._get_entry(row_key, column_family)
+        cell = entry.column_qualifiers.get(column_qualifier) if entry else None
+
+        if not cell:
+            value = check_counter(delta)
+            self._put_cell(row_key, column_family, column_qualifier, value, timestamp)
+            return value
+
+        # Counters are updated in place, an increment never adds a version. An expired counter
+        # starts over from zero.
+        last_version = cell[f"version{cell['n_versions']}"]
+        if self._is_expired(column_family, last_version["timestamp"], self._expiry()):
+            value = check_counter(delta)
+        else:
+            value = check_counter(get_counter_value(last_version["value"]) + delta)
+        last_version["value"] = value
+        last_version["timestamp"] = timestamp or datetime.now().isoformat()
+        entry.touch(last_version["timestamp"])
+        return value
+
+    @synchronized
+    def cell_timestamp(self, row_key: str, column_family: str, column_qualifier: str) -> Optional[str]:
+        # Timestamp of the latest version of the cell
+        entry = self._get_entry(row_key, column_family)
+        cell = entry.column_qualifiers.get(column_qualifier) if entry else None
+        return cell[f"version{cell['n_versions']}"]["timestamp"] if cell else None
+
+    @synchronized
+    def get_counter(self, row_key: str, column_family: str, column_qualifier: str) -> Optional[int]:
         if self.metadata.is_disabled:
-            raise Exception("Failed to scan data: Table is disabled.")
+            raise Exception("Failed to get counter: Table is disabled.")
 
-        scan_str = "ROW \t\t\t COLUMN+CELL\n"
+        value = self._get_cell_value(row_key, column_family, column_qualifier)
+        return get_counter_value(value) if value is not None else None
+
+    @synchronized
+    def compact(self, major: bool = False) -> int:
+        # Drops the versions over the VERSIONS limit of each family. A major compaction also drops
+        # the data of column families that no longer exist.
+        removed = 0
+        data = []
         for entry in self.data:
-            for cq, val in entry.column_qualifiers.items():
-                for version, data in val.items():
-                    if version == "n_versions":
-                        continue
-                    scan_str += f"{entry.row_key}\t\t\t column={entry.column_family}:{cq}, timestamp={data['timestamp']}, value={data['value']}\n"
-        return scan_str
+            policy = self.policies.get(entry.column_family)
+            if not policy:
+                if major:
+                    removed += sum(cell["n_versions"] for cell in entry.column_qualifiers.values())
+                    self.metadata.n_rows -= 1
+                    continue
+                data.append(entry)
+                continue
+
+            keep = policy.max_versions
+            for cell in entry.column_qualifiers.values():
+                removed += prune_versions(cell, keep)
+            data.append(entry)
+
+        self.data = data
+        return removed
+
+    @synchronized
+    def reap(self, start_row: Optional[str] = None, limit: int = 1000) -> tuple[int, Optional[str]]:
+        # Removes the expired versions of about limit entries from start_row on, so the table lock is
+        # only held for a short while. Returns the number of versions removed and the row key to
+        # continue from, None once the end of the table is reached.
+        expiry = self._expiry()
+        if not expiry:
+            return 0, None
+
+        i = self._entry_position(start_row) if start_row else 0
+        end = min(i + limit, len(self.data))
+        while 0 < end < len(self.data) and self.data[end].row_key == self.data[end - 1].row_key:
+            end += 1  # Batches end at a row boundary
+
+        removed = 0
+        kept = []
+        for entry in itertools.islice(self.data, i, end):
+            cutoff, min_versions = expiry.get(entry.column_family, (None, 0))
+            if cutoff is not None:
+                if not min_versions and entry.latest_timestamp() < cutoff:
+                    removed += sum(cell["n_versions"] for cell in entry.column_qualifiers.values())
+                    entry.column_qualifiers = {}
+                else:
+                    for cq, cell in list(entry.column_qualifiers.items()):
+                        removed += expire_versions(cell, cutoff, min_versions)
+                        if not cell["n_versions"]:
+                            del entry.column_qualifiers[cq]
+            if entry.column_qualifiers:
+                kept.append(entry)
+            else:
+                self.metadata.n_rows -= 1
+
+        if len(kept) != end - i:
+            self.data[i:end] = kept
+        end = i + len(kept)
+        return removed, self.data[end].row_key if end < len(self.data) else None
+
+    def _get_cell_value(self, row_key: str, column_family: str, column_qualifier: str):
+        entry = self._get_entry(row_key, column_family)
+        cell = entry.column_qualifiers.get(column_qualifier) if entry else None
+        if not cell:
+            return None
+        last_version = cell[f"version{cell['n_versions']}"]
+        if self._is_expired(column_family, last_version["timestamp"], self._expiry()):
+            return None
+        return last_version["value"]
+
+    def check_and_mutate(self, conditions: List[Condition], mutations: List[Mutation]) -> bool:
+        if self.metadata.is_disabled:
+            raise Exception("Failed to check and mutate: Table is disabled.")
+        for mutation in mutations:
+            if mutation.method not in ("put", "delete"):
+                raise Exception(f"Invalid mutation method '{mutation.method}'")
+            if mutation.column_family not in self.policies:
+                raise Exception(f"Column family '{mutation.column_family}' not found")
+
+        # Every involved row stays locked from the first check to the last mutation
+        row_keys = [c.row_key for c in conditions] + [m.row_key for m in mutations]
+        with self.row_lock(*row_keys), self.lock:
+            for c in conditions:
+                current = self._get_cell_value(c.row_key, c.column_family, c.column_qualifier)
+                if not compare_values(current, c.operator, c.value, c.numeric):
+                    return False
+
+            for m in mutations:
+                if m.method == "put":
+                    self.put(m.row_key, m.column_family, m.column_qualifier, m.value)
+                elif self._get_cell_value(m.row_key, m.column_family, m.column_qualifier) is not None:
+                    self.delete(m.row_key, m.column_family, m.column_qualifier)
+
+        return True
+
+    def check_and_put(self, row_key: str, column_family: str, column_qualifier: str, op: str, expected,
+                      put_column_family: str, put_column_qualifier: str, value, numeric: bool = False) -> bool:
+        return self.check_and_mutate(
+            [Condition(row_key, column_family, column_qualifier, op, expected, numeric)],
+            [Mutation(row_key, put_column_family, put_column_qualifier, value)],
+        )
+
+    def check_and_delete(self, row_key: str, column_family: str, column_qualifier: str, op: str, expected,
+                         delete_column_family: Optional[str] = None, delete_column_qualifier: Optional[str] = None,
+                         numeric: bool = False) -> bool:
+        # Deletes the checked cell unless another one is given
+        return self.check_and_mutate(
+            [Condition(row_key, column_family, column_qualifier, op, expected, numeric)],
+            [Mutation(row_key, delete_column_family or column_family,
+                      delete_column_qualifier or column_qualifier, method="delete")],
+        )
+
+    @synchronized
+    def get_row(self, row_key: str, column_family: Optional[str] = None, column_qualifier: Optional[str] = None,
+                versions: int = 1) -> Result:
+        if self.metadata.is_disabled:
+            raise Exception("Failed 1 action: NotServingRegionException: 1 time,")
+
+        result = Result(row_key)
+        qualifiers = {column_qualifier} if column_qualifier else None
+        expiry = self._expiry()
+        i = self._entry_position(row_key)
+        while i < len(self.data) and self.data[i].row_key == row_key:
+            entry = self.data[i]
+            i += 1
+            if not column_family or entry.column_family == column_family:
+                result.cells.extend(live_cells(entry, expiry, versions, qualifiers))
+        return result
+
+    @synchronized
+    def get_rows(self, row_keys: List[str], columns: Optional[List[str]] = None, versions: int = 1) -> List[Result]:
+        # Multi-get: the keys are sorted and resolved in a single pass over the sorted data, each
+        # lookup galloping forward from the previous one. Columns are either 'family' or
+        # 'family:qualifier'. Keys without data are left out.
+        if self.metadata.is_disabled:
+            raise Exception("Failed 1 action: NotServingRegionException: 1 time,")
+
+        families = None
+        if columns:
+            families = {}
+            for column in columns:
+                cf, _, cq = column.partition(":")
+                if cq and families.get(cf, set()) is not None:
+                    families.setdefault(cf, set()).add(cq)
+                else:
+                    families[cf] = None  # Whole family
+
+        results = []
+        expiry = self._expiry()
+        i = 0
+        for row_key in sorted(set(row_keys)):
+            i = bisect.bisect_left(self.data, row_key, lo=i, key=entry_row_key)
+            result = Result(row_key)
+            while i < len(self.data) and self.data[i].row_key == row_key:
+                entry = self.data[i]
+                i += 1
+                if families is None:
+                    result.cells.extend(live_cells(entry, expiry, versions))
+                elif entry.column_family in families:
+                    result.cells.extend(live_cells(entry, expiry, versions, families[entry.column_family]))
+            if result.cells:
+                results.append(result)
+
+        return results
+
+    @synchronized
+    def scan(self, start_row: Optional[str] = None, stop_row: Optional[str] = None,
+             limit: Optional[int] = None) -> List[Result]:
+        if self.metadata.is_disabled:
+            raise Exception("Failed to scan data: Table is disabled.")
+
+        results = []
+        expiry = self._expiry()
+        i = self._entry_position(start_row) if start_row else 0
+        for entry in itertools.islice(self.data, i, None):
+            if stop_row and entry.row_key >= stop_row:
+                break
+            cells = live_cells(entry, expiry)
+            if not cells:
+                continue
+            if not results or results[-1].row_key != entry.row_key:
+                if limit and len(results) >= limit:
+                    break
+                results.append(Result(entry.row_key))
+            results[-1].cells.extend(cells)
+        return results
 
     def count(self) -> int:
         if self.metadata.is_disabled:
@@ -1,25 +1,146 @@
-from dataclasses import dataclass, asdict
+import re
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List, Any
+from enum import Enum
+from typing import List, Any, Optional, Collection
+
+
+class DataBlockEncoding(str, Enum):
+    NONE = 'NONE'
+    PREFIX = 'PREFIX'
+    DIFF = 'DIFF'
+    FAST_DIFF = 'FAST_DIFF'
+    ROW_INDEX_V1 = 'ROW_INDEX_V1'
+
+
+class BloomFilter(str, Enum):
+    NONE = 'NONE'
+    ROW = 'ROW'
+    ROWCOL = 'ROWCOL'
+    ROWPREFIX_FIXED_LENGTH = 'ROWPREFIX_FIXED_LENGTH'
+
+
+class Compression(str, Enum):
+    NONE = 'NONE'
+    GZ = 'GZ'
+    LZO = 'LZO'
+    LZ4 = 'LZ4'
+    SNAPPY = 'SNAPPY'
+    ZSTD = 'ZSTD'
+    BZIP2 = 'BZIP2'
+    LZMA = 'LZMA'
+
+
+class KeepDeletedCells(str, Enum):
+    FALSE = 'FALSE'
+    TRUE = 'TRUE'
+    TTL = 'TTL'
+
+
+def parse_int(key: str, value, minimum: int = 0) -> int:
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise Exception(f"Invalid value '{value}' for {key.upper()}, expected an integer")
+    if isinstance(value, bool) or number < minimum:
+        raise Exception(f"Invalid value '{value}' for {key.upper()}, expected an integer >= {minimum}")
+    return number
+
+
+def parse_bool(key: str, value) -> bool:
+    if isinstance(value, bool):
+        return value
+    if str(value).lower() in ('true', 'false'):
+        return str(value).lower() == 'true'
+    raise Exception(f"Invalid value '{value}' for {key.upper()}, expected true or false")
+
+
+def parse_enum(key: str, value, enum: type[Enum]) -> Enum:
+    if isinstance(value, enum):
+        return value
+    try:
+        return enum(str(value).upper())
+    except ValueError:
+        raise Exception(f"Invalid value '{value}' for {key.upper()}. Use one of: {', '.join(e.value for e in enum)}")
+
+
+def parse_ttl(value) -> Optional[int]:
+    # Seconds, None is FOREVER
+    if value is None or str(value).upper() == 'FOREVER':
+        return None
+    # As printed by HBase's describe, '86400 SECONDS (1 DAY)'
+    match = re.fullmatch(r"(\d+) SECONDS( \(.*\))?", str(value).strip().upper())
+    return parse_int('ttl', match.group(1) if match else value, minimum=1)
+
+
+@dataclass
+class FamilyPolicy:
+    # The settings of a column family the read and write paths need, computed once per schema change
+    name: str
+    max_versions: int
+    min_versions: int
+    ttl: Optional[int]
+    replicated: bool
 
 
 @dataclass
 class ColumnFamily:
+    # Typed schema of a column family. Accepts the HBase string form (as stored in the table files
+    # and typed in the shell) and validates it; to_dict gives the string form back.
     name: str
-    data_block_encoding: str = 'NONE'
-    bloomfilter: str = 'ROW'
-    replication_scope: str = '0'
-    versions: str = '1'
-    compression: str = 'NONE'
-    min_versions: str = '0'
-    ttl: str = 'FOREVER'
-    keep_deleted_cells: str = 'FALSE'
-    block_size: str = '65536'
-    in_memory: str = 'false'
-    block_cache: str = 'true'
+    data_block_encoding: DataBlockEncoding = DataBlockEncoding.NONE
+    bloomfilter: BloomFilter = BloomFilter.ROW
+    replication_scope: int = 0
+    versions: int = 1
+    compression: Compression = Compression.NONE
+    min_versions: int = 0
+    ttl: Optional[int] = None
+    keep_deleted_cells: KeepDeletedCells = KeepDeletedCells.FALSE
+    block_size: int = 65536
+    in_memory: bool = False
+    block_cache: bool = True
+
+    def __post_init__(self):
+        self.data_block_encoding = parse_enum('data_block_encoding', self.data_block_encoding, DataBlockEncoding)
+        self.bloomfilter = parse_enum('bloomfilter', self.bloomfilter, BloomFilter)
+        self.replication_scope = parse_int('replication_scope', self.replication_scope)
+        if self.replication_scope > 1:
+            raise Exception(f"Invalid value '{self.replication_scope}' for REPLICATION_SCOPE, expected 0 or 1")
+        self.versions = parse_int('versions', self.versions, minimum=1)
+        self.compression = parse_enum('compression', self.compression, Compression)
+        self.min_versions = parse_int('min_versions', self.min_versions)
+        if self.min_versions > self.versions:
+            raise Exception(f"MIN_VERSIONS ({self.min_versions}) cannot be greater than VERSIONS ({self.versions})")
+        self.ttl = parse_ttl(self.ttl)
+        self.keep_deleted_cells = parse_enum('keep_deleted_cells', self.keep_deleted_cells, KeepDeletedCells)
+        self.block_size = parse_int('block_size', self.block_size, minimum=1)
+        self.in_memory = parse_bool('in_memory', self.in_memory)
+        self.block_cache = parse_bool('block_cache', self.block_cache)
 
     def to_dict(self):
-        return asdict(self)
+        return {
+            'name': self.name,
+            'data_block_encoding': self.data_block_encoding.value,
+            'bloomfilter': self.bloomfilter.value,
+            'replication_scope': str(self.replication_scope),
+            'versions': str(self.versions),
+            'compression': self.compression.value,
+            'min_versions': str(self.min_versions),
+            'ttl': 'FOREVER' if self.ttl is None else str(self.ttl),
+            'keep_deleted_cells': self.keep_deleted_cells.value,
+            'block_size': str(self.block_size),
+            'in_memory': str(self.in_memory).lower(),
+            'block_cache': str(self.block_cache).lower(),
+        }
+
+    def policy(self) -> FamilyPolicy:
+        return FamilyPolicy(
+            name=self.name,
+            max_versions=self.versions,
+            min_versions=self.min_versions,
+            ttl=self.ttl,
+            replicated=self.replication_scope == 1,
+        )
 
     @classmethod
     def get_valid_keys(cls):
@@ -37,11 +158,91 @@ class MetaData:
     n_rows: int
 
 
+@dataclass
+class Condition:
+    row_key: str
+    column_family: str
+    column_qualifier: str
+    operator: str = '='  # =, !=, <, <=, >, >= applied as <current value> <operator> <value>
+    value: Any = None  # None checks that the cell does not exist
+    numeric: bool = False  # Compare the values as numbers, otherwise only counters do
+
+
+@dataclass
+class Mutation:
+    row_key: str
+    column_family: str
+    column_qualifier: str
+    value: Any = None
+    method: str = 'put'  # put or delete
+
+
+@dataclass
+class Cell:
+    column_family: str
+    column_qualifier: str
+    timestamp: str
+    value: Any
+
+
+@dataclass
+class Result:
+    row_key: str
+    cells: List[Cell] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        # family -> qualifier -> cells, newest first
+        families = {}
+        for cell in self.cells:
+            families.setdefault(cell.column_family, {}).setdefault(cell.column_qualifier, []).append(
+                {"timestamp": cell.timestamp, "value": cell.value}
+            )
+        return families
+
+    def get_value(self, column_family: str, column_qualifier: str) -> Any:
+        for cell in self.cells:
+            if cell.column_family == column_family and cell.column_qualifier == column_qualifier:
+                return cell.value
+        return None
+
+
 @dataclass
 class RowEntry:
     row_key: str
     column_family: str
     column_qualifiers: dict[str, Any]
+    # Upper bound of the newest timestamp in the entry, computed on first use and raised by the
+    # writers. Not stored in the table files.
+    max_timestamp: Optional[str] = field(default=None, compare=False, repr=False)
+
+    def latest_timestamp(self) -> str:
+        if self.max_timestamp is None:
+            self.max_timestamp = max(
+                (cell[f"version{cell['n_versions']}"]["timestamp"] for cell in self.column_qualifiers.values()),
+                default="",
+            )
+        return self.max_timestamp
+
+    def touch(self, timestamp: str) -> None:
+        if self.max_timestamp is not None and timestamp > self.max_timestamp:
+            self.max_timestamp = timestamp
+
+    def cells(self, versions: Optional[int] = None, qualifiers: Optional[Collection[str]] = None,
+              cutoff: Optional[str] = None, min_versions: int = 0) -> List[Cell]:
+        # Newest version first, all of them unless a number of versions is given. Versions older
+        # than the cutoff are expired and left out, except for the newest min_versions.
+        cells = []
+        for cq, cell in self.column_qualifiers.items():
+            if qualifiers is not None and cq not in qualifiers:
+                continue
+            n_versions = cell["n_versions"]
+            oldest = max(n_versions - versions, 0) if versions else 0
+            for v in range(n_versions, oldest, -1):
+                version = cell[f"version{v}"]
+                if cutoff and n_versions - v >= min_versions and version["timestamp"] < cutoff:
+                    break  # The older versions expired too
+                cells.append(Cell(self.column_family, cq, version["timestamp"], version["value"]))
+        return cells
 
     def to_dict(self):
         return {
@@ -9,3 +9,44 @@ def update_timestamp(func):
         return func(self, *args, **kwargs)
 
     return wrapper
+
+
+def row_locked(func):
+    # The first argument of the decorated method is the row key
+    @wraps(func)
+    def wrapper(self, row_key, *args, **kwargs):
+        with self.row_lock(row_key):
+            return func(self, row_key, *args, **kwargs)
+
+    return wrapper
+
+
+def synchronized(func):
+    # Holds the table lock, background maintenance threads read and rewrite the table data
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return func(self, *args, **kwargs)
+
+    return wrapper
+
+
+def observed(func):
+    # Calls the pre_<name> and post_<name> hooks of the table observers around the mutation. Must go
+    # inside row_locked: the hooks then see the mutations of a row in the order they were applied,
+    # which the replication edit log relies on.
+    name = func.__name__
+
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if not self.observers:
+            return func(self, *args, **kwargs)
+
+        for observer in self.observers:
+            getattr(observer, f"pre_{name}")(self, *args, **kwargs)
+        result = func(self, *args, **kwargs)
+        for observer in self.observers:
+            getattr(observer, f"post_{name}")(self, result, *args, **kwargs)
+        return result
+
+    return wrapper